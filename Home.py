@@ -1,6 +1,12 @@
 import streamlit as st
 from navigation import render_navigation_buttons
+from theme import apply_theme
+from page_timing import start_page_timer
 from footer import render_footer
+from gemini_client import start_background_warmup
+
+# Times each run of this page; see page_timing.py.
+TIMER = start_page_timer("home")
 
 st.set_page_config(
     page_title="Incubate2025 - Neonatal Dashboard",
@@ -8,81 +14,8 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Custom CSS for professional, subtle neonatal care design
-st.markdown("""
-<style>
-    /* Main page styling */
-    .main-container {
-        background: linear-gradient(135deg, #FAFBFC 0%, #F0F4F8 100%);
-        padding: 30px;
-        border-radius: 15px;
-        margin: 20px 0;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.05);
-        border: 1px solid rgba(91, 155, 213, 0.1);
-    }
-    
-    /* Title styling */
-    .main-title {
-        background: linear-gradient(45deg, #5B9BD5, #7FB8E6);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        text-align: center;
-        font-size: 3rem;
-        font-weight: bold;
-        margin: 30px 0;
-    }
-    
-    /* Welcome section */
-    .welcome-section {
-        background: #F8FAFE;
-        padding: 25px;
-        border-radius: 12px;
-        margin: 20px 0;
-        border: 1px solid #E1E8ED;
-        box-shadow: 0 2px 8px rgba(91, 155, 213, 0.08);
-    }
-    
-    /* Feature cards */
-    .feature-card {
-        background: #FFFFFF;
-        padding: 20px;
-        border-radius: 12px;
-        margin: 15px 0;
-        border: 1px solid #E1E8ED;
-        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.04);
-        transition: transform 0.2s ease, box-shadow 0.2s ease;
-    }
-    
-    .feature-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 16px rgba(91, 155, 213, 0.12);
-    }
-    
-    /* Text styling */
-    .home-text {
-        font-size: 1.05rem;
-        line-height: 1.6;
-        color: #2C3E50;
-        text-align: left;
-    }
-    
-    .section-header {
-        color: #5B9BD5;
-        font-size: 1.6rem;
-        font-weight: 600;
-        margin: 15px 0 10px 0;
-        text-align: center;
-    }
-    
-    /* Info box styling */
-    .stAlert {
-        border-radius: 10px !important;
-        border: 1px solid #5B9BD5 !important;
-        background: #F8FAFE !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for professional, subtle neonatal care design (styles/home.css)
+apply_theme("home")
 
 render_navigation_buttons()
 
@@ -91,6 +24,7 @@ render_navigation_buttons()
 
 # Professional title
 st.markdown('<h1 class="main-title">NEONATAL DASHBOARD</h1>', unsafe_allow_html=True)
+TIMER.first_render()
 
 # Welcome section
 st.markdown("""
@@ -154,3 +88,6 @@ st.markdown('</div>', unsafe_allow_html=True)
 
 render_footer()
 
+# Load the model client and heavy libraries in the background after first paint.
+start_background_warmup()
+TIMER.finish()
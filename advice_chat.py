@@ -0,0 +1,280 @@
+import streamlit as st
+from chat_context import get_conversation_context
+from gemini_client import get_model, iter_text, model_cache_id
+from model_router import expected_sections, get_model_router
+from response_parser import parse_response
+from retry import FallbackResponse
+from session_store import ChatMessage
+from stream_render import write_sectioned_stream
+from telemetry import get_telemetry
+from translation_cache import get_translation_cache
+
+# --- CHAT CONFIGURATION ---
+# Render replies chunk by chunk as they arrive instead of after the final token.
+STREAM_RESPONSES = True
+# Shown in place of a reply while the AI service is unavailable; never stored in the chat history.
+OFFLINE_NOTICE = ("The assistant is offline right now because the AI service is unavailable. "
+                  "Your message has been kept; please send it again in a few minutes.")
+
+# Replies are generated in the selected language in one call, rather than in
+# English and translated afterwards.
+LANGUAGE_INSTRUCTION = (
+    "\n\nWrite the whole reply in {language}. Keep every [START_...] and [END_...] delimiter "
+    "exactly as written in your instructions, in English."
+)
+
+USER_AVATAR = ":material/person:"
+
+
+class AdviceChat:
+    """
+    The plan-and-follow-up chat shared by the Feed and Nutrition pages.
+    Replies follow `system_instruction`; their delimited sections are laid
+    out in columns of the given `widths`, `columns[i]` listing the sections
+    shown in column i. Messages live in the page's `state` namespace, and
+    requests are recorded in telemetry under its name.
+    """
+
+    def __init__(self, state, system_instruction, widths, columns, avatar):
+        self.state = state
+        self.page = state.namespace
+        self.system_instruction = system_instruction
+        # Sections every reply must open and close; replies from a cheaper
+        # tier that miss one are regenerated on the pro tier.
+        self.expected_sections = expected_sections(system_instruction)
+        self.widths = widths
+        self.columns = columns
+        self.avatar = avatar
+
+    # --- TRANSLATION ---
+    def translate_text(self, text, target_language, source_language="English"):
+        """
+        Translates text to the target language using Gemini API. Only used when
+        the language is switched after a reply was generated; results from the
+        routed tier are cached.
+        """
+        if target_language == source_language:
+            return text
+
+        router = get_model_router()
+        route = router.route("translation", text, language=target_language)
+        cache_id = model_cache_id(route.model)
+        cache = get_translation_cache()
+        prompt = f"Translate the following {source_language} text to {target_language}. Maintain all formatting, markdown syntax, and structure exactly as is:\n\n{text}"
+        try:
+            with get_telemetry().span(self.page, "translate", model=cache_id, tier=route.tier) as span:
+                cached = cache.get(text, target_language, cache_id)
+                span.cache_hit(cached is not None)
+                if cached is not None:
+                    return cached
+                model = get_model(route.model)
+                # While upstream is unavailable the source text is shown instead.
+                translated = span.call(lambda: model.generate_content(prompt), fallback=lambda: FallbackResponse(text)).text
+
+            # The translation must keep every delimited section of the source.
+            if router.needs_fallback(route, translated, expected_sections(text)):
+                route = router.fallback(route)
+                model = get_model(route.model)
+                with get_telemetry().span(self.page, "translate", model=model_cache_id(route.model), tier=route.tier, fallback=True) as span:
+                    translated = span.call(lambda: model.generate_content(prompt),
+                                           fallback=lambda: FallbackResponse(text)).text
+                # Not cached: entries are keyed by the routed tier, which did not produce this text.
+                return translated
+            if translated is text:
+                return text
+            cache.set(text, target_language, cache_id, translated)
+            return translated
+        except Exception as e:
+            st.error(f"Translation error: {e}")
+            return text
+
+    def get_localized_content(self, message, language="English"):
+        """
+        Returns the message text in the requested language. Translations are stored
+        on the message itself so each response is translated at most once, and
+        only when shown in a language other than the one it was written in.
+        """
+        if language == message.language:
+            return message.text
+        translations = message.translations
+        if language not in translations:
+            translated = self.translate_text(message.text, language, message.language)
+            if translated == message.text:
+                # Translation failed; leave it uncached so the next render retries.
+                return translated
+            translations[language] = translated
+        return translations[language]
+
+    def get_localized_sections(self, message, language="English"):
+        """
+        Returns the parsed sections of the message in the requested language,
+        parsing each language's text only once.
+        """
+        if language not in message.sections:
+            text = self.get_localized_content(message, language)
+            if language != message.language and language not in message.translations:
+                # Untranslated fallback; parse it but don't cache it as this language.
+                return parse_response(text)
+            message.sections[language] = parse_response(text)
+        return message.sections[language]
+
+    # --- MODEL CALLS ---
+    def get_gemini_response(self, prompt, route, language="English", stream=False, fallback=False):
+        """
+        Sends a prompt to the model picked by `route` and returns the response,
+        written directly in `language` with the section delimiters intact.
+        With `stream=True` an iterator of text chunks is returned instead.
+        Handles chat history and potential errors.
+        """
+        if language != "English":
+            prompt += LANGUAGE_INSTRUCTION.format(language=language)
+        try:
+            # Recent turns verbatim plus a rolling summary of older ones, within a token budget
+            messages = get_conversation_context(self.state).build_history(self.state.messages)
+            model = get_model(route.model, self.system_instruction)
+
+            def send():
+                chat = model.start_chat(history=messages)
+                return chat.send_message(prompt, stream=stream)
+
+            # A streamed span stays open until the reply has been fully rendered.
+            with get_telemetry().span(self.page, route.task, model=model_cache_id(route.model), tier=route.tier,
+                                      fallback=fallback) as span:
+                response = span.call(send, stream=stream, fallback=lambda: FallbackResponse(OFFLINE_NOTICE))
+                if stream:
+                    return iter_text(response)
+                return response.text
+        except Exception as e:
+            st.error(f"An error occurred: {e}. This might be due to API rate limits or configuration issues.")
+            return None
+
+    # --- RENDERING ---
+    def display_formatted_response(self, parsed):
+        """
+        Displays a parsed model response in the page's column layout. Responses
+        without delimiters are shown as plain markdown.
+        """
+        if parsed.preamble.strip():
+            st.markdown(parsed.preamble)
+        if not parsed.sections:
+            return
+
+        for column, names in zip(st.columns(self.widths), self.columns):
+            with column:
+                for name in names:
+                    st.markdown(parsed.get(name))
+
+        if parsed.trailing.strip():
+            st.markdown(parsed.trailing)
+
+    def stream_formatted_response(self, chunks):
+        """
+        Streams the model's response into the same layout as
+        display_formatted_response, filling each section as soon as it arrives.
+        Returns the ParsedResponse assembled while streaming.
+        """
+        snapshot = st.container()
+        containers = {name: column for column, names in zip(st.columns(self.widths), self.columns) for name in names}
+        trailing = st.container()
+        return write_sectioned_stream(chunks, containers, leading=snapshot, trailing=trailing)
+
+    def render_assistant_reply(self, prompt, task, language, spinner_text="Thinking..."):
+        """
+        Gets a reply for `prompt` in `language` from the model tier the router
+        picks for `task` ("plan" or "follow_up"), renders it in an assistant chat
+        message and stores it in the chat history. A reply that misses any of
+        the expected sections is replaced by one from the pro tier; one cut off
+        mid-stream is replaced by an error, and while upstream is unavailable
+        OFFLINE_NOTICE is shown instead; neither is stored.
+        """
+        router = get_model_router()
+        route = router.route(task, prompt, language=language)
+        with st.chat_message("assistant", avatar=self.avatar):
+            parsed = None
+            reply_area = st.empty()
+            fallback = False
+            while True:
+                if STREAM_RESPONSES:
+                    with st.spinner(spinner_text):
+                        chunks = self.get_gemini_response(prompt, route, language, stream=True, fallback=fallback)
+                    try:
+                        with reply_area.container():
+                            parsed = self.stream_formatted_response(chunks) if chunks else None
+                    except Exception as e:
+                        # The stream broke off mid-reply: drop the partial text and keep it out of the history.
+                        reply_area.error(f"The response was interrupted: {e}. Please try again.")
+                        return
+                    response = parsed.text if parsed else None
+                else:
+                    with st.spinner(spinner_text):
+                        response = self.get_gemini_response(prompt, route, language, fallback=fallback)
+                if response == OFFLINE_NOTICE:
+                    reply_area.info(OFFLINE_NOTICE, icon=":material/cloud_off:")
+                    return
+                if not response or not router.needs_fallback(route, response, self.expected_sections):
+                    break
+                route, fallback = router.fallback(route), True
+                reply_area.empty()
+            if response:
+                message = ChatMessage("assistant", response, language=language)
+                if parsed:
+                    message.sections[language] = parsed
+                self.state.messages.append(message)
+                if not STREAM_RESPONSES:
+                    self.display_formatted_response(self.get_localized_sections(message, language))
+            else:
+                st.warning("Sorry, I couldn't get a response. Please try again.")
+
+    def render_message(self, message, language):
+        avatar = self.avatar if message.role == "assistant" else USER_AVATAR
+        with st.chat_message(message.role, avatar=avatar):
+            if message.role == "assistant":
+                self.display_formatted_response(self.get_localized_sections(message, language))
+            else:
+                st.markdown(message.text)
+
+
+# --- FRAGMENTS ---
+# The conversation is split into fragments so most interactions rerun only
+# their own region: sending a follow-up reruns only the live conversation.
+# Turns rendered by the last full run stay on screen from that run's chat
+# history fragment. Full reruns (page load, language switch, plan request)
+# fold new turns into the history.
+@st.fragment
+def chat_history(chat, language):
+    """Turns up to the last full run; not re-executed when a follow-up is sent."""
+    messages = chat.state.messages
+    # Only the recent window is loaded; older turns are read from disk on request.
+    if messages.has_older:
+        st.button(":material/history: Show earlier messages", key=chat.state.key("load_older"),
+                  on_click=messages.load_older, use_container_width=True)
+    for message in messages[messages.loaded_from:chat.state.history_len]:
+        chat.render_message(message, language)
+
+
+@st.fragment
+def live_conversation(chat, language, plan_spinner_text):
+    """Turns since the last full run, any pending reply and the input box."""
+    messages = chat.state.messages
+    for message in messages[chat.state.history_len:]:
+        chat.render_message(message, language)
+
+    if pending_prompt := chat.state.pop("pending_prompt"):
+        chat.render_assistant_reply(pending_prompt, "plan", language, plan_spinner_text)
+
+    # Handle follow-up questions from the user
+    if prompt := st.chat_input("Ask a follow-up question..."):
+        messages.append(ChatMessage("user", prompt))
+        with st.chat_message("user", avatar=USER_AVATAR):
+            st.markdown(prompt)
+        chat.render_assistant_reply(prompt, "follow_up", language)
+
+
+def request_plan(chat, user_prompt, notice):
+    """
+    Records `notice` as the user's turn and reruns the page; the plan for
+    `user_prompt` is answered in the live conversation so it can stream in.
+    """
+    chat.state.messages.append(ChatMessage("user", notice))
+    chat.state.pending_prompt = user_prompt
+    st.rerun()
@@ -0,0 +1,154 @@
+"""
+End-to-end latency benchmark for every page, driven by Streamlit's AppTest
+against the offline mock backend (no API key or network needed).
+
+    python benchmarks/bench_pages.py --runs 20 --latency 0.5
+
+Reports p50/p95 rerun time, upstream model calls and bytes sent per
+interaction, plus the page's time to first render (navigation and title
+sent) and the markdown payload each rerun sends to the browser.
+Mock latency and fault injection can also be set with the
+INCUBATE_MOCK_* environment variables described in mock_gemini.py.
+Run once more with --no-context-cache to compare bytes sent with system
+instructions resent inline instead of served from the context cache.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["INCUBATE_GEMINI_BACKEND"] = "fake"
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import gemini_client
+import mock_gemini
+import retry
+from page_timing import get_page_timings
+
+
+def _chat_steps():
+    return [
+        ("load", lambda at: at.run()),
+        ("get plan", lambda at: at.sidebar.button[0].click().run()),
+        ("move slider / change input", lambda at: at.run()),
+        ("follow-up question", lambda at: at.chat_input[0].set_value("Is this normal?").run()),
+        ("switch to Hindi", lambda at: at.sidebar.selectbox[0].set_value("Hindi").run()),
+        ("rerun in Hindi", lambda at: at.run()),
+    ]
+
+
+SCENARIOS = {
+    "Home.py": [
+        ("load", lambda at: at.run()),
+    ],
+    "pages/1_Feed.py": _chat_steps(),
+    "pages/3_Nutrition.py": _chat_steps(),
+    "pages/2_Infection.py": [
+        ("load", lambda at: at.run()),
+        ("open clinical tab", lambda at: at.button(key="btn_A").click().run()),
+        ("open lab tab", lambda at: at.button(key="btn_B").click().run()),
+        ("analyze", lambda at: at.button[-1].click().run()),
+        ("analyze again", lambda at: at.button[-1].click().run()),
+    ],
+    "pages/4_Umbilical.py": [
+        ("load", lambda at: at.run()),
+        ("tick symptom", lambda at: at.sidebar.checkbox[0].check().run()),
+    ],
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def markdown_bytes(at):
+    """UTF-8 size of every markdown element emitted by the last rerun."""
+    return sum(len(element.value.encode("utf-8")) for element in at.get("markdown"))
+
+
+def run_scenario(page, steps, runs, cold):
+    results = {name: {"times": [], "calls": [], "bytes": [], "markdown": [], "first_render": []} for name, _ in steps}
+    for _ in range(runs):
+        if cold:
+            st.cache_data.clear()
+            st.cache_resource.clear()
+        at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+        for name, step in steps:
+            before = mock_gemini.STATS.snapshot()
+            timings = get_page_timings()
+            runs_before = {page: len(timings.samples(page)) for page in timings.pages()}
+            start = time.perf_counter()
+            step(at)
+            elapsed = time.perf_counter() - start
+            if at.exception:
+                raise RuntimeError(f"{page} / {name}: {at.exception[0].message}")
+            after = mock_gemini.STATS.snapshot()
+            results[name]["times"].append(elapsed * 1000)
+            results[name]["calls"].append(after["calls"] - before["calls"])
+            results[name]["bytes"].append(after["bytes_sent"] - before["bytes_sent"])
+            results[name]["markdown"].append(markdown_bytes(at))
+            new_runs = [sample for page in timings.pages() for sample in timings.samples(page)[runs_before.get(page, 0):]]
+            if new_runs:
+                results[name]["first_render"].append(new_runs[-1]["first_render_ms"])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh sessions per page")
+    parser.add_argument("--pages", nargs="*", default=list(SCENARIOS), help="pages to benchmark")
+    parser.add_argument("--latency", type=float, help="mock latency per model call (seconds)")
+    parser.add_argument("--rpm", type=float, default=1e6,
+                        help="shared rate-limiter budget; the default effectively disables it so "
+                             "page latency is not dominated by token-bucket waits")
+    parser.add_argument("--cold", action="store_true", help="clear Streamlit caches before every run")
+    parser.add_argument("--no-context-cache", action="store_true",
+                        help="resend system instructions with every request instead of caching them")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    retry.REQUESTS_PER_MINUTE = args.rpm
+    retry.BURST_SIZE = max(retry.BURST_SIZE, int(args.rpm))
+    if args.no_context_cache:
+        gemini_client.CONTEXT_CACHING = False
+    if args.latency is not None:
+        mock_gemini.SETTINGS.update(latency_seconds=args.latency)
+
+    report = {}
+    header = (f"{'page':<22} {'interaction':<28} {'p50 ms':>9} {'p95 ms':>9} {'TTFR ms':>8} {'calls':>6} "
+              f"{'KB sent':>9} {'MD KB':>7}")
+    print(header)
+    print("-" * len(header))
+    for page in args.pages:
+        results = run_scenario(page, SCENARIOS[page], args.runs, args.cold)
+        report[page] = {}
+        for name, data in results.items():
+            row = {
+                "p50_ms": percentile(data["times"], 50),
+                "p95_ms": percentile(data["times"], 95),
+                "calls": statistics.mean(data["calls"]),
+                "bytes_sent": statistics.mean(data["bytes"]),
+                "markdown_bytes": statistics.mean(data["markdown"]),
+                "first_render_p50_ms": percentile(data["first_render"], 50) if data["first_render"] else None,
+            }
+            report[page][name] = row
+            first_render = row["first_render_p50_ms"]
+            first_render = f"{first_render:>8.1f}" if first_render is not None else f"{'-':>8}"
+            print(f"{page:<22} {name:<28} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {first_render} "
+                  f"{row['calls']:>6.1f} {row['bytes_sent'] / 1024:>9.1f} {row['markdown_bytes'] / 1024:>7.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from gemini_client import get_model, model_cache_id
+from model_router import get_model_router
+from retry import get_circuit_breaker, get_rate_limiter
+from telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+# --- CONTEXT WINDOW CONFIGURATION ---
+# Messages sent verbatim on every turn (a user question + reply is two).
+MAX_VERBATIM_MESSAGES = 6
+# Upper bound on estimated history tokens per request, summary included.
+HISTORY_TOKEN_BUDGET = 6000
+CHARS_PER_TOKEN = 4
+SUMMARY_MAX_WORDS = 200
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a parent and a neonatal care assistant. "
+    "Keep the baby's details, the parent's concerns and any advice already given. "
+    f"Reply with the updated summary only, in at most {SUMMARY_MAX_WORDS} words.\n\n"
+    "Current summary:\n{summary}\n\nNew messages:\n{transcript}"
+)
+
+
+def estimate_tokens(text):
+    """Cheap local token estimate; avoids a count_tokens round-trip per turn."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def range_tokens(messages, start, stop):
+    """Estimated tokens of messages[start:stop]; a Conversation sums them without loading them."""
+    if hasattr(messages, "tokens"):
+        return messages.tokens(start, stop)
+    return sum(estimate_tokens(m.text) for m in messages[start:stop])
+
+
+def to_content(message):
+    """Maps a stored chat message to a Gemini history entry."""
+    role = "model" if message.role == "assistant" else "user"
+    return {"role": role, "parts": [message.text]}
+
+
+@st.cache_resource
+def get_summary_executor():
+    """Process-wide pool that builds rolling summaries off the script thread."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+
+
+class ConversationContext:
+    """
+    Keeps the last MAX_VERBATIM_MESSAGES messages verbatim and folds older
+    ones into a rolling summary, computed once per evicted message on a
+    background thread. Tracks how many prompt tokens the window saved.
+    Summary requests are recorded in telemetry under `page`.
+    """
+
+    def __init__(self, max_messages=MAX_VERBATIM_MESSAGES, token_budget=HISTORY_TOKEN_BUDGET, page=None,
+                 conversation=None):
+        self.page = page
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.conversation = conversation
+        self.summary = ""
+        self.summarized_upto = 0
+        if conversation is not None:
+            self.summary, self.summarized_upto = conversation.load_summary()
+        self.conversation_tokens = 0
+        self.counted_upto = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+        self._future = None
+        self._lock = threading.Lock()
+
+    @property
+    def tokens_saved(self):
+        return self.full_tokens - self.sent_tokens
+
+    def build_history(self, messages):
+        """
+        Returns the Gemini `history` for the next turn. The welcome message and
+        the trailing user message (sent separately as the prompt) are left out.
+        """
+        # Indexes only the ends of `messages`, so a Conversation never has to
+        # bring its older turns into memory.
+        total = len(messages)
+        start = 0
+        while start < total and messages[start].role != "user":
+            start += 1
+        end = total
+        while end > start and messages[end - 1].role == "user":
+            end -= 1
+
+        # Older messages reach the model through the summary. Those not yet
+        # folded in stay verbatim (within the token budget) until it catches up.
+        window_start = max(start, end - self.max_messages)
+        with self._lock:
+            summary, summarized_upto = self.summary, self.summarized_upto
+        recent = messages[min(window_start, start + summarized_upto):end]
+
+        history = []
+        budget = self.token_budget
+        if summary:
+            history = [
+                {"role": "user", "parts": [f"Summary of our earlier conversation:\n{summary}"]},
+                {"role": "model", "parts": ["Thank you, I will keep this in mind."]},
+            ]
+            budget -= estimate_tokens(summary)
+
+        kept = []
+        for message in reversed(recent):
+            cost = estimate_tokens(message.text)
+            if kept and cost > budget:
+                break
+            kept.append(message)
+            budget -= cost
+        kept.reverse()
+        # Gemini expects the history to open with a user turn.
+        while kept and kept[0].role != "user":
+            kept.pop(0)
+        history += [to_content(m) for m in kept]
+
+        if end > self.counted_upto:
+            self.conversation_tokens += range_tokens(messages, max(start, self.counted_upto), end)
+            self.counted_upto = end
+        self.full_tokens += self.conversation_tokens
+        self.sent_tokens += sum(estimate_tokens(part) for entry in history for part in entry["parts"])
+        self._schedule_summary(messages, start, window_start)
+        return history
+
+    def _schedule_summary(self, messages, start, window_start):
+        """Folds messages[start:window_start], which left the window, into the summary in the background."""
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                return
+            new_messages = messages[start + self.summarized_upto:window_start]
+            if not new_messages:
+                return
+            summary, upto = self.summary, self.summarized_upto + len(new_messages)
+        transcript = "\n".join(f"{m.role.title()}: {m.text}" for m in new_messages)
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none yet)", transcript=transcript)
+        # Resolve shared resources on the script thread; the worker has no Streamlit context.
+        route = get_model_router().route("summary", prompt)
+        model, limiter, breaker = get_model(route.model), get_rate_limiter(), get_circuit_breaker()
+        span = get_telemetry().span(self.page, "summary", model=model_cache_id(route.model), tier=route.tier)
+
+        def summarize():
+            try:
+                with span:
+                    response = span.call(lambda: model.generate_content(prompt), limiter=limiter, breaker=breaker)
+            except Exception as e:
+                # Left unsummarized: the messages stay verbatim and the next turn retries.
+                logger.warning("Conversation summary failed: %s", e)
+                return
+            with self._lock:
+                self.summary = response.text.strip()
+                self.summarized_upto = upto
+            if self.conversation is not None:
+                self.conversation.save_summary(self.summary, upto)
+
+        with self._lock:
+            self._future = get_summary_executor().submit(summarize)
+
+
+def get_conversation_context(state):
+    """
+    Returns the ConversationContext kept in a page's session-state namespace.
+    With a stored Conversation in `state.messages`, its summary is restored
+    from and saved to the conversation store.
+    """
+    if "chat_context" not in state:
+        conversation = state.get("messages")
+        if not hasattr(conversation, "save_summary"):
+            conversation = None
+        state.chat_context = ConversationContext(page=state.namespace, conversation=conversation)
+    return state.chat_context
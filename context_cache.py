@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- CONTEXT CACHE CONFIGURATION ---
+CONTEXT_CACHE_TTL_SECONDS = 60 * 60
+# A handle is refreshed once less than this much of its TTL is left, so no
+# request references a prefix that is about to expire upstream.
+REFRESH_MARGIN_SECONDS = 5 * 60
+# After a failed registration the plain model is used for this long.
+RETRY_REGISTRATION_SECONDS = 30 * 60
+EXPIRED_ERROR_NAMES = ("NotFound", "PermissionDenied")
+
+
+class ContextCacheUnsupportedError(Exception):
+    """Raised by a backend that cannot cache this model / instruction pair."""
+
+
+def is_expired_cache_error(error):
+    """True for the errors upstream returns when a cached prefix no longer exists."""
+    expired = isinstance(error, LookupError) or type(error).__name__ in EXPIRED_ERROR_NAMES
+    return expired and "cache" in str(error).lower()
+
+
+class CachedPrefix:
+    """A registered system instruction: the backend handle, a model bound to it and its local expiry."""
+
+    __slots__ = ("handle", "model", "expires_at")
+
+    def __init__(self, handle, model, expires_at):
+        self.handle = handle
+        self.model = model
+        self.expires_at = expires_at
+
+
+class ContextCache:
+    """
+    Registers each (model, system instruction) pair once with the backend's
+    cached-content API and hands out models that reference the cached prefix
+    by handle instead of resending it. Handles are refreshed before their
+    TTL runs out and re-created after expiry. Pairs the backend cannot cache
+    (e.g. below its minimum size) get a plain model with the instruction.
+    """
+
+    def __init__(self, backend, ttl_seconds=CONTEXT_CACHE_TTL_SECONDS, refresh_margin=REFRESH_MARGIN_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.created = 0
+        self.refreshed = 0
+        self.invalidated = 0
+        self._entries = {}
+        self._plain_models = {}
+        self._retry_at = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name, system_instruction):
+        return model_name, hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+
+    def model_for(self, model_name, system_instruction):
+        key = self._key(model_name, system_instruction)
+        # Registration is rare (once per TTL), so it runs under the lock to
+        # keep concurrent requests from creating duplicate cache entries.
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.expires_at - self.refresh_margin:
+                return entry.model
+            if entry is not None and now < entry.expires_at:
+                try:
+                    self.backend.refresh_cached_content(entry.handle, self.ttl_seconds)
+                    entry.expires_at = now + self.ttl_seconds
+                    self.refreshed += 1
+                    return entry.model
+                except Exception as e:
+                    logger.warning("Refreshing cached context for %s failed, re-creating it: %s", model_name, e)
+            self._entries.pop(key, None)
+
+            if now >= self._retry_at.get(key, 0):
+                try:
+                    handle = self.backend.create_cached_content(model_name, system_instruction, self.ttl_seconds)
+                    model = self.backend.model_from_cached_content(handle)
+                except ContextCacheUnsupportedError:
+                    self._retry_at[key] = float("inf")
+                except Exception as e:
+                    logger.warning("Could not cache the system instruction for %s: %s", model_name, e)
+                    self._retry_at[key] = now + RETRY_REGISTRATION_SECONDS
+                else:
+                    self._entries[key] = CachedPrefix(handle, model, now + self.ttl_seconds)
+                    self.created += 1
+                    return model
+
+            if key not in self._plain_models:
+                self._plain_models[key] = self.backend.create_model(model_name, system_instruction=system_instruction)
+            return self._plain_models[key]
+
+    def invalidate(self, model_name, system_instruction):
+        with self._lock:
+            if self._entries.pop(self._key(model_name, system_instruction), None) is not None:
+                self.invalidated += 1
+
+    def is_cached(self, model_name, system_instruction):
+        with self._lock:
+            return self._key(model_name, system_instruction) in self._entries
+
+
+class ContextCachedModel:
+    """
+    Drop-in for a model with a system instruction. Every request resolves the
+    current cached prefix; a request that hits an expired prefix invalidates
+    it and is sent once more against a fresh one.
+    """
+
+    def __init__(self, cache, model_name, system_instruction):
+        self.cache = cache
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def call(self, fn):
+        try:
+            return fn(self.cache.model_for(self.model_name, self.system_instruction))
+        except Exception as e:
+            if not is_expired_cache_error(e):
+                raise
+            self.cache.invalidate(self.model_name, self.system_instruction)
+            return fn(self.cache.model_for(self.model_name, self.system_instruction))
+
+    def generate_content(self, contents, **kwargs):
+        return self.call(lambda model: model.generate_content(contents, **kwargs))
+
+    def start_chat(self, history=None):
+        return ContextCachedChatSession(self, history)
+
+
+class ContextCachedChatSession:
+    """
+    Chat session whose turns are sent through `ContextCachedModel.call`. The
+    underlying session is rebuilt, with its history, only when the cached
+    prefix behind it changes.
+    """
+
+    def __init__(self, owner, history=None):
+        self.owner = owner
+        self._history = list(history or [])
+        self._session = None
+        self._model = None
+
+    @property
+    def history(self):
+        return self._session.history if self._session is not None else self._history
+
+    def send_message(self, content, **kwargs):
+        def send(model):
+            if model is not self._model:
+                self._session, self._model = model.start_chat(history=self.history), model
+            return self._session.send_message(content, **kwargs)
+        return self.owner.call(send)
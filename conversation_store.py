@@ -0,0 +1,417 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+
+import streamlit as st
+from chat_context import estimate_tokens
+from session_store import ChatMessage
+
+# --- STORE CONFIGURATION ---
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+CONVERSATION_DB_PATH = os.path.join(CACHE_DIR, "conversations.sqlite3")
+# Messages held in memory and rendered by a full page run; older ones are
+# read from disk when the parent asks for them.
+RECENT_WINDOW = 20
+LOAD_OLDER_BATCH = 20
+# A conversation untouched for this long drops its messages from memory;
+# they are read back from disk on its next use.
+IDLE_EVICT_SECONDS = 10 * 60
+SWEEP_INTERVAL_SECONDS = 60
+# The logs hold clinical conversations, so they are not kept indefinitely:
+# a conversation with no new message for RETENTION_SECONDS is deleted from
+# disk, summary included. Checked at most once per PURGE_INTERVAL_SECONDS.
+RETENTION_SECONDS = 30 * 24 * 60 * 60
+PURGE_INTERVAL_SECONDS = 60 * 60
+# The conversation id travels in the URL (`?chat=...`), so a reload or a
+# reconnect after the server dropped the session picks the history back up.
+CONVERSATION_PARAM = "chat"
+CONVERSATION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ConversationStore:
+    """
+    Append-only message log per (conversation, page) in a SQLite file in WAL
+    mode, so script threads read while another one appends. Each thread uses
+    its own connection. Also keeps each conversation's rolling summary and
+    tracks live `Conversation` objects so idle ones can be evicted.
+    Conversations idle for `retention_seconds` are purged from disk.
+    Without a writable disk every conversation simply stays in memory.
+    """
+
+    def __init__(self, db_path=CONVERSATION_DB_PATH, idle_seconds=IDLE_EVICT_SECONDS,
+                 sweep_interval=SWEEP_INTERVAL_SECONDS, retention_seconds=RETENTION_SECONDS,
+                 purge_interval=PURGE_INTERVAL_SECONDS):
+        self.db_path = db_path
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self.retention_seconds = retention_seconds
+        self.purge_interval = purge_interval
+        self.evicted = 0
+        self.purged = 0
+        self._local = threading.local()
+        self._live = weakref.WeakSet()
+        self._last_sweep = self._last_purge = time.monotonic()
+        self._lock = threading.Lock()
+        self.persistent = True
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            db = self._connection()
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "conversation TEXT NOT NULL, page TEXT NOT NULL, seq INTEGER NOT NULL, "
+                "role TEXT NOT NULL, text TEXT NOT NULL, language TEXT NOT NULL, "
+                "tokens INTEGER NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (conversation, page, seq))"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "conversation TEXT NOT NULL, page TEXT NOT NULL, summary TEXT NOT NULL, "
+                "upto INTEGER NOT NULL, PRIMARY KEY (conversation, page))"
+            )
+            db.commit()
+        except (OSError, sqlite3.Error):
+            # A read-only or full disk should only cost us persistence.
+            self.persistent = False
+        self.purge()
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.db_path, timeout=5)
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def count(self, conversation, page):
+        """Length of the log, i.e. the seq the next message will get."""
+        if not self.persistent:
+            return 0
+        try:
+            row = self._connection().execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE conversation = ? AND page = ?",
+                (conversation, page),
+            ).fetchone()
+            return row[0]
+        except sqlite3.Error:
+            return 0
+
+    def append(self, conversation, page, message):
+        """
+        Appends `message` at the end of the log and returns the seq it was
+        given, or None if it could not be written. Another tab on the same
+        conversation may have appended since the caller last looked, so the
+        seq can be past the caller's own count.
+        """
+        if not self.persistent:
+            return None
+        db = self._connection()
+        try:
+            # Numbered inside the INSERT so concurrent appends get distinct seqs.
+            cursor = db.execute(
+                "INSERT INTO messages (conversation, page, seq, role, text, language, tokens, created) "
+                "SELECT ?, ?, COALESCE(MAX(seq) + 1, 0), ?, ?, ?, ?, ? FROM messages "
+                "WHERE conversation = ? AND page = ?",
+                (conversation, page, message.role, message.text, message.language,
+                 estimate_tokens(message.text), time.time(), conversation, page),
+            )
+            seq = db.execute("SELECT seq FROM messages WHERE rowid = ?", (cursor.lastrowid,)).fetchone()[0]
+            db.commit()
+            return seq
+        except sqlite3.Error:
+            db.rollback()
+            return None
+
+    def read(self, conversation, page, start, stop):
+        """Messages `start` to `stop` (exclusive) of the log, oldest first."""
+        if not self.persistent or start >= stop:
+            return []
+        try:
+            rows = self._connection().execute(
+                "SELECT role, text, language FROM messages "
+                "WHERE conversation = ? AND page = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (conversation, page, start, stop),
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+        return [ChatMessage(role, text, language=language) for role, text, language in rows]
+
+    def tokens(self, conversation, page, start, stop):
+        """Estimated tokens of messages `start` to `stop`, summed on disk."""
+        if not self.persistent or start >= stop:
+            return 0
+        try:
+            row = self._connection().execute(
+                "SELECT COALESCE(SUM(tokens), 0) FROM messages "
+                "WHERE conversation = ? AND page = ? AND seq >= ? AND seq < ?",
+                (conversation, page, start, stop),
+            ).fetchone()
+            return row[0]
+        except sqlite3.Error:
+            return 0
+
+    def load_summary(self, conversation, page):
+        """Returns the stored `(summary, upto)` pair, or `("", 0)`."""
+        if not self.persistent:
+            return "", 0
+        try:
+            row = self._connection().execute(
+                "SELECT summary, upto FROM summaries WHERE conversation = ? AND page = ?", (conversation, page)
+            ).fetchone()
+        except sqlite3.Error:
+            return "", 0
+        return row if row is not None else ("", 0)
+
+    def save_summary(self, conversation, page, summary, upto):
+        if not self.persistent:
+            return
+        db = self._connection()
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO summaries (conversation, page, summary, upto) VALUES (?, ?, ?, ?)",
+                (conversation, page, summary, upto),
+            )
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+
+    def track(self, conversation):
+        with self._lock:
+            self._live.add(conversation)
+
+    def purge(self):
+        """Deletes conversations with no message newer than `retention_seconds`; returns how many."""
+        if not self.persistent:
+            return 0
+        db = self._connection()
+        try:
+            cursor = db.execute(
+                "DELETE FROM messages WHERE (conversation, page) IN ("
+                "SELECT conversation, page FROM messages GROUP BY conversation, page HAVING MAX(created) < ?)",
+                (time.time() - self.retention_seconds,),
+            )
+            db.execute(
+                "DELETE FROM summaries WHERE NOT EXISTS (SELECT 1 FROM messages m "
+                "WHERE m.conversation = summaries.conversation AND m.page = summaries.page)"
+            )
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+            return 0
+        with self._lock:
+            self.purged += cursor.rowcount
+        return cursor.rowcount
+
+    def sweep(self):
+        """
+        Evicts idle conversations from memory, at most once per
+        `sweep_interval`, and purges expired ones from disk at most once per
+        `purge_interval`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+            purge = now - self._last_purge >= self.purge_interval
+            if purge:
+                self._last_purge = now
+            live = list(self._live)
+        if purge:
+            self.purge()
+        for conversation in live:
+            if now - conversation.last_used > self.idle_seconds and conversation.release():
+                with self._lock:
+                    self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            live = list(self._live)
+        return {
+            "conversations": len(live),
+            "resident": sum(1 for c in live if c.resident),
+            "messages_in_memory": sum(c.messages_in_memory for c in live),
+            "evicted": self.evicted,
+            "purged_messages": self.purged,
+        }
+
+
+@st.cache_resource
+def get_conversation_store():
+    """Process-wide conversation store shared by every session."""
+    return ConversationStore()
+
+
+class Conversation:
+    """
+    One page's chat history, read and appended like a list. Only messages
+    from `loaded_from` onwards are held in memory: the recent window plus
+    any older ones the page asked for. Earlier indices are read from the
+    store on access without being kept. Another tab on the same
+    conversation appends to the same log; its messages show up here once
+    `refresh()` (on a full page run) or this object's next append notices.
+    """
+
+    def __init__(self, store, conversation_id, page, welcome_text, window=RECENT_WINDOW):
+        self.store = store
+        self.id = conversation_id
+        self.page = page
+        self.window = window
+        self.welcome_text = welcome_text
+        self.last_used = time.monotonic()
+        self._lock = threading.RLock()
+        self._length = self._saved = store.count(conversation_id, page)
+        self.loaded_from = max(0, self._length - window)
+        self._messages = None
+        if self._length == 0:
+            self.append(ChatMessage("assistant", welcome_text))
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        with self._lock:
+            self.last_used = time.monotonic()
+            if isinstance(index, slice):
+                start, stop, step = index.indices(self._length)
+                if step != 1:
+                    return list(self[start:stop])[::step]
+                if start >= stop:
+                    return []
+                older = self.store.read(self.id, self.page, start, min(stop, self.loaded_from))
+                loaded = self._loaded()
+                return older + loaded[max(start, self.loaded_from) - self.loaded_from:max(0, stop - self.loaded_from)]
+            if index < 0:
+                index += self._length
+            if not 0 <= index < self._length:
+                raise IndexError("conversation index out of range")
+            if index < self.loaded_from:
+                return self.store.read(self.id, self.page, index, index + 1)[0]
+            return self._loaded()[index - self.loaded_from]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def _loaded(self):
+        if self._messages is None:
+            self._messages = self.store.read(self.id, self.page, self.loaded_from, self._length)
+        return self._messages
+
+    def append(self, message):
+        with self._lock:
+            self.last_used = time.monotonic()
+            self._loaded().append(message)
+            self._length += 1
+            # Messages that could not be written yet stay in memory and are retried here.
+            drifted = False
+            for pending in self._messages[self._saved - self.loaded_from:]:
+                seq = self.store.append(self.id, self.page, pending)
+                if seq is None:
+                    break
+                drifted = drifted or seq != self._saved
+                self._saved += 1
+            if drifted:
+                self._resync()
+
+    def _resync(self, saved=None):
+        # Re-reads the recent window from the log, keeping unsaved messages at the end.
+        unsaved = self._messages[self._saved - self.loaded_from:] if self._messages is not None else []
+        self._saved = saved if saved is not None else self.store.count(self.id, self.page)
+        self._length = self._saved + len(unsaved)
+        self.loaded_from = max(0, self._saved - self.window)
+        self._messages = self.store.read(self.id, self.page, self.loaded_from, self._saved) + unsaved
+
+    def refresh(self):
+        """Picks up messages another tab appended, or a purge of this conversation, since the last look."""
+        with self._lock:
+            saved = self.store.count(self.id, self.page)
+            if not self.store.persistent or saved == self._saved:
+                return
+            self._resync(saved)
+            if self._length == 0:
+                self.append(ChatMessage("assistant", self.welcome_text))
+
+    @property
+    def has_older(self):
+        return self.loaded_from > 0
+
+    @property
+    def resident(self):
+        return self._messages is not None
+
+    @property
+    def messages_in_memory(self):
+        return len(self._messages) if self._messages is not None else 0
+
+    def load_older(self, count=LOAD_OLDER_BATCH):
+        """Brings the `count` messages before the loaded ones into memory."""
+        with self._lock:
+            start = max(0, self.loaded_from - count)
+            older = self.store.read(self.id, self.page, start, self.loaded_from)
+            self._messages = older + self._loaded()
+            self.loaded_from = start
+
+    def trim(self):
+        """Drops saved messages older than the recent window from memory."""
+        with self._lock:
+            start = min(max(0, self._length - self.window), self._saved)
+            if start > self.loaded_from and self._messages is not None:
+                del self._messages[:start - self.loaded_from]
+            self.loaded_from = max(self.loaded_from, start)
+
+    def release(self):
+        """Frees the in-memory messages if all of them are on disk; True if it did."""
+        with self._lock:
+            if self._messages is None or self._saved < self._length:
+                return False
+            self._messages = None
+            self.loaded_from = max(0, self._length - self.window)
+            return True
+
+    def tokens(self, start, stop):
+        """Estimated tokens of `self[start:stop]`, without loading older messages."""
+        with self._lock:
+            on_disk = self.store.tokens(self.id, self.page, start, min(stop, self.loaded_from))
+            loaded = self._loaded()[max(start, self.loaded_from) - self.loaded_from:max(0, stop - self.loaded_from)]
+            return on_disk + sum(estimate_tokens(m.text) for m in loaded)
+
+    def load_summary(self):
+        return self.store.load_summary(self.id, self.page)
+
+    def save_summary(self, summary, upto):
+        self.store.save_summary(self.id, self.page, summary, upto)
+
+
+def conversation_id():
+    """
+    Id of this browser session's conversations. Taken from the `?chat=` query
+    parameter when valid, otherwise new, and written back to the URL.
+    """
+    if "conversation_id" not in st.session_state:
+        requested = st.query_params.get(CONVERSATION_PARAM, "")
+        valid = CONVERSATION_ID_PATTERN.match(requested)
+        st.session_state.conversation_id = requested if valid else uuid.uuid4().hex
+    if st.query_params.get(CONVERSATION_PARAM) != st.session_state.conversation_id:
+        st.query_params[CONVERSATION_PARAM] = st.session_state.conversation_id
+    return st.session_state.conversation_id
+
+
+def get_conversation(state, welcome_text):
+    """
+    Returns the page's Conversation, restored from disk or seeded with the
+    welcome message, trimmed to the recent window. Call on full page runs.
+    """
+    store = get_conversation_store()
+    store.sweep()
+    conversation = state.get("messages")
+    if conversation is None:
+        conversation = state.messages = Conversation(store, conversation_id(), state.namespace, welcome_text)
+        store.track(conversation)
+    else:
+        conversation_id()
+        conversation.refresh()
+        conversation.trim()
+    return conversation
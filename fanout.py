@@ -0,0 +1,93 @@
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import streamlit as st
+
+# --- FAN-OUT CONFIGURATION ---
+MAX_WORKERS = 8
+DEFAULT_TASK_TIMEOUT_SECONDS = 60.0
+# How often `on_poll` runs while tasks are pending.
+POLL_INTERVAL_SECONDS = 0.5
+
+
+@st.cache_resource
+def get_fanout_executor():
+    """Process-wide pool for concurrent model sub-requests."""
+    return ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fanout")
+
+
+def run_parallel(tasks, on_result=None, timeouts=None, default_timeout=DEFAULT_TASK_TIMEOUT_SECONDS,
+                 on_poll=None, poll_interval=POLL_INTERVAL_SECONDS, max_in_flight=None):
+    """
+    Runs each callable in `tasks` (a name -> callable dict) concurrently and
+    returns a name -> (status, value) dict, where status is "done", "error"
+    or "timeout". `on_result(name, status, value)` is called on the calling
+    thread as each task finishes, so partial results can be rendered. A
+    task's timeout counts from when a worker starts it, and a task that
+    exceeds it is reported and no longer waited for. At most
+    `max_in_flight` tasks are handed to the shared pool at once; the rest
+    are submitted as earlier ones finish, so a large batch neither crowds
+    out other sessions nor spends its timeouts waiting for a worker.
+    `on_poll()` is also called on the calling thread about every
+    `poll_interval` seconds while tasks are pending, e.g. to show progress
+    the tasks post from their threads.
+
+    Tasks run without a Streamlit script context: resolve anything that
+    needs `st.*` (cached resources, session state) before submitting.
+    """
+    executor = get_fanout_executor()
+    timeouts = timeouts or {}
+    queued = deque(tasks.items())
+    started = {}
+    futures = {}
+    abandoned = set()
+    results = {}
+
+    def run(name, fn):
+        started[name] = time.monotonic()
+        return fn()
+
+    def submit():
+        # Timed-out tasks still hold their worker until they return.
+        abandoned.difference_update([f for f in abandoned if f.done()])
+        while queued and (max_in_flight is None or len(futures) + len(abandoned) < max_in_flight):
+            name, fn = queued.popleft()
+            futures[executor.submit(run, name, fn)] = name
+
+    def deadline(future):
+        name = futures[future]
+        return started[name] + timeouts.get(name, default_timeout) if name in started else None
+
+    def report(future, status, value):
+        name = futures.pop(future)
+        results[name] = (status, value)
+        if on_result is not None:
+            on_result(name, status, value)
+
+    while futures or queued:
+        now = time.monotonic()
+        for future in [f for f in futures if deadline(f) is not None and deadline(f) <= now]:
+            abandoned.add(future)
+            report(future, "timeout", None)
+        submit()
+        if not futures:
+            if queued:
+                # Every slot is held by a timed-out task.
+                wait(abandoned, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            continue
+        deadlines = [d for d in map(deadline, futures) if d is not None]
+        timeout = min(deadlines) - now if deadlines else poll_interval
+        # Tasks still waiting for a worker get their deadline once they start.
+        if on_poll is not None or len(deadlines) < len(futures):
+            timeout = min(timeout, poll_interval)
+        done, _ = wait(futures, timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is not None:
+                report(future, "error", error)
+            else:
+                report(future, "done", future.result())
+        if on_poll is not None and (futures or queued):
+            on_poll()
+    return results
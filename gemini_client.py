@@ -0,0 +1,209 @@
+import datetime
+import os
+import threading
+
+import streamlit as st
+from context_cache import ContextCache, ContextCachedModel, ContextCacheUnsupportedError
+from lazy_imports import lazy_import, start_warmup
+from mock_gemini import FakeCachedContent, FakeModel
+
+# Imported on the first real model request or by the background warm-up.
+genai = lazy_import("google.generativeai")
+
+# --- CLIENT CONFIGURATION ---
+DEFAULT_MODEL = "gemini-1.5-pro-latest"
+BACKEND_ENV_VAR = "INCUBATE_GEMINI_BACKEND"
+# System instructions are registered once with the provider's context cache
+# and referenced by handle (context_cache.py). Set INCUBATE_CONTEXT_CACHE=0
+# to resend them with every request instead, e.g. to compare the two.
+CONTEXT_CACHING = os.environ.get("INCUBATE_CONTEXT_CACHE", "1") != "0"
+CHARS_PER_TOKEN = 4
+
+
+class MissingApiKeyError(Exception):
+    """Raised when the Gemini API key is not present in Streamlit secrets."""
+
+
+class GeminiBackend:
+    """
+    Interface for the model provider. A backend hands out model objects that
+    expose the `generate_content` / `start_chat` API of `genai.GenerativeModel`.
+    """
+
+    name = "base"
+
+    def create_model(self, model_name, system_instruction=None):
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Loads and sets up the client ahead of the first request. Optional."""
+
+    def create_cached_content(self, model_name, system_instruction, ttl_seconds):
+        """
+        Registers `system_instruction` upstream for `ttl_seconds` and returns
+        a handle. Raises ContextCacheUnsupportedError when it cannot be cached.
+        """
+        raise ContextCacheUnsupportedError(f"The {self.name} backend has no context cache.")
+
+    def refresh_cached_content(self, handle, ttl_seconds):
+        raise NotImplementedError
+
+    def model_from_cached_content(self, handle):
+        raise NotImplementedError
+
+
+class GoogleBackend(GeminiBackend):
+    """
+    Talks to the hosted Gemini API. Only the API key is read up front; the
+    library is imported and `genai.configure` runs on the first request (or
+    during warm-up). Configuring resets the library's client manager, so it
+    runs exactly once per process and every model shares the same channel.
+    """
+
+    name = "google"
+    # Gemini 1.5 rejects cached content below this many tokens; smaller
+    # instructions are sent inline as before.
+    min_cached_tokens = 32768
+
+    def __init__(self):
+        try:
+            self._api_key = st.secrets["gemini_api_key"]["GEMINI_API_KEY"]
+        except (KeyError, TypeError, FileNotFoundError) as e:
+            raise MissingApiKeyError("Gemini API key not found in Streamlit secrets.") from e
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        with self._lock:
+            if not self._configured:
+                genai.configure(api_key=self._api_key)
+                self._configured = True
+
+    def create_model(self, model_name, system_instruction=None):
+        self.warm_up()
+        return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+    def create_cached_content(self, model_name, system_instruction, ttl_seconds):
+        if len(system_instruction) // CHARS_PER_TOKEN < self.min_cached_tokens:
+            raise ContextCacheUnsupportedError(f"Instruction is below {self.min_cached_tokens} tokens.")
+        self.warm_up()
+        return genai.caching.CachedContent.create(model=model_name, system_instruction=system_instruction,
+                                                  ttl=datetime.timedelta(seconds=ttl_seconds))
+
+    def refresh_cached_content(self, handle, ttl_seconds):
+        handle.update(ttl=datetime.timedelta(seconds=ttl_seconds))
+
+    def model_from_cached_content(self, handle):
+        return genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+
+class FakeBackend(GeminiBackend):
+    """
+    Runs the whole app offline without an API key or network access. Latency,
+    streaming and fault injection are configured in `mock_gemini.SETTINGS`.
+    """
+
+    name = "fake"
+
+    def create_model(self, model_name, system_instruction=None):
+        return FakeModel(model_name, system_instruction=system_instruction)
+
+    def create_cached_content(self, model_name, system_instruction, ttl_seconds):
+        return FakeCachedContent(model_name, system_instruction, ttl_seconds)
+
+    def refresh_cached_content(self, handle, ttl_seconds):
+        handle.update(ttl_seconds)
+
+    def model_from_cached_content(self, handle):
+        return FakeModel(handle.model_name, cached_content=handle)
+
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def register_backend(backend_cls):
+    """
+    Makes a custom backend selectable by name through the `gemini_backend`
+    secret or the INCUBATE_GEMINI_BACKEND environment variable.
+    """
+    BACKENDS[backend_cls.name] = backend_cls
+    return backend_cls
+
+
+def _selected_backend_name():
+    name = os.environ.get(BACKEND_ENV_VAR)
+    if not name:
+        try:
+            name = st.secrets.get("gemini_backend", GoogleBackend.name)
+        except FileNotFoundError:
+            name = GoogleBackend.name
+    return name
+
+
+@st.cache_resource
+def get_backend(name=None):
+    """
+    Returns the process-wide backend instance. Raises MissingApiKeyError when
+    the hosted backend is selected but no key is configured.
+    """
+    name = name or _selected_backend_name()
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown Gemini backend '{name}'. Available: {', '.join(BACKENDS)}") from None
+    return backend_cls()
+
+
+@st.cache_resource
+def get_context_cache():
+    """Process-wide registry of system instructions held in the backend's context cache."""
+    return ContextCache(get_backend())
+
+
+@st.cache_resource
+def get_model(model_name=DEFAULT_MODEL, system_instruction=None):
+    """
+    Returns a shared model object keyed by model name and system instruction,
+    so pages stop constructing a new `GenerativeModel` on every request. With
+    a system instruction, requests reference its cached copy where possible.
+    """
+    if system_instruction and CONTEXT_CACHING:
+        return ContextCachedModel(get_context_cache(), model_name, system_instruction)
+    return get_backend().create_model(model_name, system_instruction=system_instruction)
+
+
+def model_cache_id(model_name=DEFAULT_MODEL):
+    """
+    Identifies a model for cache keys. The backend name is included so offline
+    replies never leak into caches read by the hosted backend.
+    """
+    return f"{get_backend().name}:{model_name}"
+
+
+def iter_text(response):
+    """
+    Yields the text of each chunk of a streamed response. Chunks without text
+    parts (e.g. the final chunk carrying only a finish reason) are skipped.
+    """
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if text:
+            yield text
+
+
+def start_background_warmup():
+    """
+    Once per process, imports the lazily loaded libraries and sets up the
+    model client on a background thread. Called by pages after first paint.
+    """
+    try:
+        hooks = (get_backend().warm_up,)
+    except MissingApiKeyError:
+        hooks = ()
+    start_warmup(hooks)
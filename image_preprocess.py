@@ -0,0 +1,103 @@
+import io
+
+import streamlit as st
+from lazy_imports import lazy_import
+
+# PIL is only needed once an image is actually uploaded.
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+# --- PREPROCESSING CONFIGURATION ---
+# Longest edge sent to the model; phone photos are usually 4000px or more.
+MAX_EDGE = 1536
+OUTPUT_FORMAT = "JPEG"  # or "WEBP"
+OUTPUT_QUALITY = 85
+CACHE_MAX_ENTRIES = 64
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class PreparedImage:
+    """
+    An upload that has been orientation-corrected, stripped of metadata,
+    downsized and re-encoded for the model.
+    """
+
+    def __init__(self, data, mime_type, digest, original_bytes, size):
+        self.data = data
+        self.mime_type = mime_type
+        self.digest = digest
+        self.original_bytes = original_bytes
+        self.size = size
+
+    @property
+    def bytes(self):
+        return len(self.data)
+
+    @property
+    def bytes_saved(self):
+        return self.original_bytes - self.bytes
+
+    def as_part(self):
+        """Returns the inline-data content part accepted by `generate_content`."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    def summary(self):
+        return (f"Optimized for analysis: {self.original_bytes / 1024:.0f} KB → {self.bytes / 1024:.0f} KB "
+                f"({self.size[0]}×{self.size[1]}, {self.bytes_saved / 1024:.0f} KB saved)")
+
+
+def _flatten(image):
+    """
+    Brings an image to RGB or L for encoding. High bit-depth grayscale (e.g.
+    16-bit scans) is stretched over 0-255 rather than clipped, and
+    transparent pixels are laid on white rather than turning black.
+    """
+    if image.mode.startswith("I;16") or image.mode in ("I", "F"):
+        if image.mode != "F":
+            image = image.convert("I")
+        lo, hi = image.getextrema()
+        scale = 255 / (hi - lo) if hi > lo else 0
+        return image.point(lambda v: (v - lo) * scale).convert("L")
+    if image.mode in ("RGBA", "RGBa", "LA", "La", "PA") or "transparency" in image.info:
+        background = Image.new("RGBA", image.size, "white")
+        return Image.alpha_composite(background, image.convert("RGBA")).convert("RGB")
+    if image.mode not in ("RGB", "L"):
+        return image.convert("RGB")
+    return image
+
+
+def encode_image(source, max_edge=MAX_EDGE, output_format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY):
+    """
+    Applies EXIF orientation, downsizes to `max_edge` and re-encodes the image.
+    `source` is raw bytes or a seekable binary stream, e.g. an open file.
+    Metadata is dropped because nothing but pixels is written back out.
+    Returns the encoded bytes and the final (width, height).
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        image = _flatten(ImageOps.exif_transpose(image))
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, format=output_format, quality=quality, optimize=True)
+        return out.getvalue(), image.size
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _prepare_cached(digest, _open, max_edge, output_format, quality):
+    # Keyed on the digest only; `_open` is excluded from Streamlit's hashing
+    # and only called, to get a buffer over the original, on a miss.
+    with _open() as source:
+        encoded, size = encode_image(source, max_edge, output_format, quality)
+    return encoded, size
+
+
+def prepare_stored(upload, max_edge=MAX_EDGE, output_format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY):
+    """
+    Returns a PreparedImage for an upload spilled to disk by upload_store.py.
+    Its hash is already known, and the original is streamed from disk
+    only when the prepared result is not cached.
+    """
+    encoded, size = _prepare_cached(upload.digest, upload.open, max_edge, output_format, quality)
+    return PreparedImage(encoded, MIME_TYPES[output_format], upload.digest, upload.size, size)
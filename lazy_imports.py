@@ -0,0 +1,82 @@
+import importlib
+import logging
+import threading
+import time
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """
+    Stands in for a heavy module and imports it on first attribute access,
+    so pages can render before libraries such as `google.generativeai`,
+    PIL or pandas are loaded.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        if self._module is None:
+            # import_module holds the per-module import lock, so a warm-up
+            # thread and a script thread never import the same module twice.
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r} ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+LAZY_MODULES = {}
+
+
+def lazy_import(name):
+    """Returns the shared LazyModule for `name`; the import happens on first use."""
+    if name not in LAZY_MODULES:
+        LAZY_MODULES[name] = LazyModule(name)
+    return LAZY_MODULES[name]
+
+
+def optional_module(name):
+    """Imports `name` now, returning None if it is not installed."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+@st.cache_resource
+def start_warmup(_hooks=()):
+    """
+    Once per process, imports every lazily declared module and then runs
+    `_hooks` (e.g. client setup) on a background thread. Pages call this
+    after their first render, so the first analysis or chat request finds
+    everything loaded. The hooks run without a Streamlit script context.
+    """
+    def warm():
+        start = time.perf_counter()
+        for module in list(LAZY_MODULES.values()):
+            try:
+                module.load()
+            except ImportError as e:
+                logger.warning("Warm-up could not import %s: %s", module._name, e)
+        for hook in _hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.warning("Warm-up hook %s failed: %s", getattr(hook, "__qualname__", hook), e)
+        logger.info("Warm-up finished in %.0f ms", (time.perf_counter() - start) * 1000)
+
+    thread = threading.Thread(target=warm, name="warmup", daemon=True)
+    thread.start()
+    return thread
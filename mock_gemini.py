@@ -0,0 +1,245 @@
+import os
+import random
+import re
+import threading
+import time
+
+from lazy_imports import optional_module
+
+# --- MOCK CONFIGURATION ---
+# Every setting can be overridden with an INCUBATE_MOCK_<NAME> environment
+# variable, e.g. INCUBATE_MOCK_LATENCY_SECONDS=2.5.
+DEFAULT_SETTINGS = {
+    "latency_seconds": 0.0,        # delay before the first chunk / full reply
+    "chunk_chars": 24,             # streamed chunk size
+    "chunk_delay_seconds": 0.0,    # delay between streamed chunks
+    "error_rate": 0.0,             # probability of a 503 ServiceUnavailable
+    "rate_limit_rate": 0.0,        # probability of a 429 ResourceExhausted
+    "retry_after_seconds": 1.0,    # retry hint carried by injected 429s
+}
+
+TRANSLATE_PATTERN = re.compile(r"^Translate the following (?:\w+ )?text to (\w+)\..*?\n\n(.*)$", re.DOTALL)
+REPLY_LANGUAGE_PATTERN = re.compile(r"Write the whole reply in (\w+)\.")
+HEADING_PATTERN = re.compile(r"^###\s+(.+)$", re.MULTILINE)
+BATCH_PATIENT_PATTERN = re.compile(r"^Patient (.+?): ", re.MULTILINE)
+
+
+class MockSettings:
+    """Latency, chunking and fault-injection knobs for the offline backend."""
+
+    def __init__(self, **overrides):
+        for name, default in DEFAULT_SETTINGS.items():
+            value = overrides.get(name, os.environ.get(f"INCUBATE_MOCK_{name.upper()}", default))
+            setattr(self, name, type(default)(value))
+
+    def update(self, **overrides):
+        for name, value in overrides.items():
+            if name not in DEFAULT_SETTINGS:
+                raise AttributeError(f"Unknown mock setting '{name}'")
+            setattr(self, name, type(DEFAULT_SETTINGS[name])(value))
+
+
+class MockStats:
+    """Thread-safe counters of upstream traffic seen by the offline backend."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.bytes_sent = 0
+            self.calls_by_model = {}
+
+    def record(self, model_name, bytes_sent, error=False):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.bytes_sent += bytes_sent
+            self.calls_by_model[model_name] = self.calls_by_model.get(model_name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors, "bytes_sent": self.bytes_sent,
+                    "calls_by_model": dict(self.calls_by_model)}
+
+
+SETTINGS = MockSettings()
+STATS = MockStats()
+
+
+def payload_bytes(contents):
+    """Approximates the request size of a `generate_content` payload."""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return len(contents.encode("utf-8"))
+    if isinstance(contents, bytes):
+        return len(contents)
+    if isinstance(contents, dict):
+        return sum(payload_bytes(value) for key, value in contents.items() if key != "mime_type")
+    if isinstance(contents, (list, tuple)):
+        return sum(payload_bytes(item) for item in contents)
+    return len(str(contents).encode("utf-8"))
+
+
+def text_parts(contents):
+    """Yields every text part of a payload, in order."""
+    if isinstance(contents, str):
+        yield contents
+    elif isinstance(contents, dict):
+        for value in contents.get("parts", ()):
+            yield from text_parts(value)
+    elif isinstance(contents, (list, tuple)):
+        for item in contents:
+            yield from text_parts(item)
+
+
+class UsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count, cached_content_token_count=0):
+        # As upstream, the prompt count includes the tokens served from cached content.
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.cached_content_token_count = cached_content_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    """
+    Mirrors the parts of `GenerateContentResponse` the app uses: `.text`,
+    `.usage_metadata` and chunk iteration when streamed.
+    """
+
+    def __init__(self, text, stream=False, prompt_bytes=0, settings=None, cached_bytes=0):
+        self.text = text
+        self.stream = stream
+        self.settings = settings
+        # Rough 4-bytes-per-token estimate, good enough for relative comparisons.
+        self.usage_metadata = UsageMetadata((prompt_bytes + cached_bytes) // 4, len(text.encode("utf-8")) // 4,
+                                            cached_bytes // 4)
+
+    def __iter__(self):
+        if not self.stream:
+            yield self
+            return
+        size = self.settings.chunk_chars if self.settings else DEFAULT_SETTINGS["chunk_chars"]
+        delay = self.settings.chunk_delay_seconds if self.settings else 0.0
+        for i in range(0, len(self.text), size):
+            if i and delay:
+                time.sleep(delay)
+            yield FakeResponse(self.text[i:i + size])
+
+
+class FakeChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream=False, **kwargs):
+        # Like the real ChatSession, the full history goes out with every turn.
+        turn = {"role": "user", "parts": [content]}
+        response = self.model.generate_content(self.history + [turn], stream=stream, **kwargs)
+        self.history.append(turn)
+        self.history.append({"role": "model", "parts": [response.text]})
+        return response
+
+
+class FakeCachedContent:
+    """Offline stand-in for `genai.caching.CachedContent`: a system instruction with an expiry."""
+
+    def __init__(self, model_name, system_instruction, ttl_seconds):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.name = f"cachedContents/fake-{abs(hash((model_name, system_instruction))):x}"
+        self.update(ttl_seconds)
+
+    def update(self, ttl_seconds):
+        self.expire_time = time.time() + ttl_seconds
+
+    @property
+    def expired(self):
+        return time.time() >= self.expire_time
+
+
+class FakeModel:
+    """
+    Offline stand-in for `genai.GenerativeModel`. Replies are canned, but every
+    `[START_X]` / `[END_X]` delimiter pair found in the system instruction is
+    reproduced so the pages' structured layouts render as they would live.
+    Translation prompts echo the source text back with its delimiters intact,
+    and replies asked for in another language are marked with that language.
+    Ward batch prompts get one `[PATIENT <id>]` answer line per patient.
+    A model built from `cached_content` does not resend its instruction.
+    """
+
+    def __init__(self, model_name, system_instruction=None, settings=None, stats=None, cached_content=None):
+        self.model_name = model_name
+        self.cached_content = cached_content
+        if cached_content is not None:
+            system_instruction = cached_content.system_instruction
+        self.system_instruction = system_instruction or ""
+        self.settings = settings or SETTINGS
+        self.stats = stats or STATS
+
+    def canned_text(self, contents):
+        texts = list(text_parts(contents))
+        prompt = texts[-1] if texts else ""
+        translation = TRANSLATE_PATTERN.match(prompt)
+        if translation:
+            language, source = translation.groups()
+            return f"*({language} — offline translation)*\n\n{source}"
+
+        instruction = "\n".join([self.system_instruction] + texts[:-1] + [prompt])
+        patients = BATCH_PATIENT_PATTERN.findall(prompt)
+        if patients and "[PATIENT <id>]" in instruction:
+            return "\n".join(f"[PATIENT {pid}] Moderate Risk | Offline placeholder assessment." for pid in patients)
+
+        heading = HEADING_PATTERN.search(instruction)
+        lines = [f"### {heading.group(1).strip() if heading else 'Offline response'}",
+                 f"*This reply was generated by the local fake backend for `{self.model_name}`.*", ""]
+        language = REPLY_LANGUAGE_PATTERN.search(prompt)
+        if language:
+            lines.insert(1, f"*({language.group(1)} — offline reply)*")
+        for section in dict.fromkeys(re.findall(r"\[START_([A-Z_]+)\]", instruction)):
+            title = section.replace("_", " ").title()
+            lines += [f"[START_{section}]", f"### {title}", f"- Placeholder guidance for {title.lower()}.",
+                      f"[END_{section}]", ""]
+        return "\n".join(lines)
+
+    def _inject_faults(self):
+        roll = random.random()
+        if roll >= self.settings.rate_limit_rate + self.settings.error_rate:
+            return
+        # Raise the real google.api_core types when available; imported only here.
+        api_exceptions = optional_module("google.api_core.exceptions")
+        if roll < self.settings.rate_limit_rate:
+            message = f"429 Resource has been exhausted. Please retry in {self.settings.retry_after_seconds}s."
+            raise api_exceptions.ResourceExhausted(message) if api_exceptions else ConnectionError(message)
+        if roll < self.settings.rate_limit_rate + self.settings.error_rate:
+            message = "503 The model is overloaded. Please try again later."
+            raise api_exceptions.ServiceUnavailable(message) if api_exceptions else ConnectionError(message)
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        if self.cached_content is not None:
+            if self.cached_content.expired:
+                api_exceptions = optional_module("google.api_core.exceptions")
+                message = f"404 CachedContent not found (or expired): {self.cached_content.name}"
+                raise api_exceptions.NotFound(message) if api_exceptions else LookupError(message)
+            sent, cached = payload_bytes(contents), payload_bytes(self.system_instruction)
+        else:
+            sent, cached = payload_bytes(contents) + payload_bytes(self.system_instruction), 0
+        if self.settings.latency_seconds:
+            time.sleep(self.settings.latency_seconds)
+        try:
+            self._inject_faults()
+        except Exception:
+            self.stats.record(self.model_name, sent, error=True)
+            raise
+        self.stats.record(self.model_name, sent)
+        return FakeResponse(self.canned_text(contents), stream=stream, prompt_bytes=sent, settings=self.settings,
+                            cached_bytes=cached)
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
@@ -0,0 +1,90 @@
+from collections import namedtuple
+
+import streamlit as st
+from gemini_client import DEFAULT_MODEL
+from response_parser import DELIMITER_PATTERN, parse_response
+
+# --- ROUTING CONFIGURATION ---
+# Tiers map to model names; tasks map to the tier they normally run on. Both
+# can be overridden with a `[model_routing]` secrets table holding `tiers`
+# and `tasks` sub-tables.
+FAST_MODEL = "gemini-1.5-flash-latest"
+FALLBACK_TIER = "pro"
+TIER_MODELS = {"fast": FAST_MODEL, "pro": DEFAULT_MODEL}
+TASK_TIERS = {
+    "translation": "fast",
+    "plan": "pro",
+    "follow_up": "fast",
+    "image_analysis": "pro",
+    "summary": "fast",
+}
+# Longer prompts than this go to the fallback tier even for fast tasks.
+FAST_MAX_PROMPT_CHARS = {"translation": 8000, "follow_up": 600}
+# Fast-tier generation only for replies in these languages; translation into
+# any language stays on its configured tier.
+FAST_LANGUAGES = ("English",)
+
+Route = namedtuple("Route", ["task", "tier", "model"])
+
+
+def expected_sections(text):
+    """Names of the `[START_X]` ... `[END_X]` sections that `text` opens and closes."""
+    opened, closed = set(), set()
+    for kind, name in DELIMITER_PATTERN.findall(text):
+        (opened if kind == "START" else closed).add(name)
+    return sorted(opened & closed)
+
+
+class ModelRouter:
+    """
+    Picks a model tier per task type with a few cheap heuristics: prompt
+    length, image presence and reply language. Output from a cheaper tier
+    that misses the expected delimiter structure is re-run on the fallback
+    tier by the caller (see `needs_fallback`).
+    """
+
+    def __init__(self, tier_models=None, task_tiers=None, fast_max_prompt_chars=None):
+        self.tier_models = dict(TIER_MODELS, **(tier_models or {}))
+        self.task_tiers = dict(TASK_TIERS, **(task_tiers or {}))
+        self.fast_max_prompt_chars = dict(FAST_MAX_PROMPT_CHARS, **(fast_max_prompt_chars or {}))
+
+    def _tier_route(self, task, tier):
+        return Route(task, tier, self.tier_models[tier])
+
+    def route(self, task, prompt="", images=0, language="English"):
+        tier = self.task_tiers.get(task, FALLBACK_TIER)
+        if tier != FALLBACK_TIER:
+            too_long = len(prompt) > self.fast_max_prompt_chars.get(task, float("inf"))
+            other_language = task != "translation" and language not in FAST_LANGUAGES
+            if images or too_long or other_language:
+                tier = FALLBACK_TIER
+        return self._tier_route(task, tier)
+
+    def fallback(self, route):
+        return self._tier_route(route.task, FALLBACK_TIER)
+
+    def needs_fallback(self, route, text, expected):
+        """
+        True when `text`, produced on a tier other than the fallback one, is
+        empty or lacks any of the `expected` delimited sections.
+        """
+        if route.tier == FALLBACK_TIER:
+            return False
+        if not text or not text.strip():
+            return True
+        return not parse_response(text).is_complete(expected)
+
+
+def _routing_secrets():
+    try:
+        return st.secrets.get("model_routing", {})
+    except FileNotFoundError:
+        return {}
+
+
+@st.cache_resource
+def get_model_router():
+    """Process-wide router, configured from the `model_routing` secrets table."""
+    config = _routing_secrets()
+    return ModelRouter(tier_models=config.get("tiers"), task_tiers=config.get("tasks"),
+                       fast_max_prompt_chars=config.get("fast_max_prompt_chars"))
@@ -0,0 +1,78 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# --- TIMING CONFIGURATION ---
+MAX_SAMPLES_PER_PAGE = 200
+
+
+class PageTimings:
+    """Thread-safe, bounded record of per-page script run timings."""
+
+    def __init__(self, max_samples=MAX_SAMPLES_PER_PAGE):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def is_cold(self, page):
+        with self._lock:
+            return page not in self._samples
+
+    def record(self, page, first_render_ms, total_ms, cold):
+        with self._lock:
+            samples = self._samples.setdefault(page, deque(maxlen=self.max_samples))
+            samples.append({"first_render_ms": first_render_ms, "total_ms": total_ms, "cold": cold})
+
+    def samples(self, page):
+        with self._lock:
+            return list(self._samples.get(page, ()))
+
+    def pages(self):
+        with self._lock:
+            return list(self._samples)
+
+
+@st.cache_resource
+def get_page_timings():
+    """Process-wide store of page timings."""
+    return PageTimings()
+
+
+class PageTimer:
+    """
+    Times one script run of a page: `first_render()` marks the moment the
+    page's first meaningful content (navigation and title) has been sent,
+    `finish()` the end of the run. The first run of a page in a process is
+    flagged as cold.
+    """
+
+    def __init__(self, page, store):
+        self.page = page
+        self.store = store
+        self.cold = store.is_cold(page)
+        self.start = time.perf_counter()
+        self.first_render_ms = None
+
+    def _elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def first_render(self):
+        if self.first_render_ms is None:
+            self.first_render_ms = self._elapsed_ms()
+
+    def finish(self):
+        total_ms = self._elapsed_ms()
+        self.first_render()
+        self.store.record(self.page, self.first_render_ms, total_ms, self.cold)
+        logger.info("%s %s run: first render %.1f ms, total %.1f ms",
+                    self.page, "cold" if self.cold else "warm", self.first_render_ms, total_ms)
+
+
+def start_page_timer(page):
+    """Starts timing the current script run of `page`."""
+    return PageTimer(page, get_page_timings())
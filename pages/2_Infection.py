@@ -1,37 +1,46 @@
+import time
+
 import streamlit as st
-import google.generativeai as genai
-from PIL import Image
 from navigation import render_navigation_buttons
+from theme import apply_theme
+from page_timing import start_page_timer
+from retry import get_circuit_breaker, get_rate_limiter
+from telemetry import get_telemetry
+from scheduler import QueueBoard, QueueNotice, current_session
+from model_router import get_model_router
+from prompt_templates import prompt_template
+from fanout import run_parallel
+from session_store import page_state
+from image_preprocess import prepare_stored
+from upload_store import UploadExpiredError, get_upload_store
+from gemini_client import MissingApiKeyError, get_backend, get_model, model_cache_id, start_background_warmup
+from response_cache import canonical_key, get_response_cache
+from sepsis_score import SUBSCORES, score_patient
+from sepsis_batch import (BATCH_INSTRUCTION, BATCH_MAX_IN_FLIGHT, BATCH_TASK_TIMEOUT_SECONDS, FIELDS, ID_COLUMN,
+                          MAX_BATCH_ROWS, OPTIONAL_FIELDS, build_batch_tasks, rank_patients, read_records, validate_records)
+
+# Times each run of this page; see page_timing.py.
+TIMER = start_page_timer("infection")
 
 st.set_page_config(page_title="Infection Prevention", initial_sidebar_state="collapsed")
 
-# Custom CSS for professional infection prevention page
-st.markdown("""
-<style>
-    /* Page-specific styling */
-    .infection-container {
-        background: #F8FAFE;
-        padding: 20px;
-        border-radius: 12px;
-        margin: 15px 0;
-        border: 1px solid #E1E8ED;
-        box-shadow: 0 2px 8px rgba(91, 155, 213, 0.08);
-    }
-    
-    .infection-title {
-        color: #5B9BD5;
-        text-align: center;
-        font-size: 2.2rem;
-        font-weight: 600;
-        margin: 20px 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for professional infection prevention page (styles/infection.css)
+apply_theme("infection")
 
 render_navigation_buttons()
 
 # Professional title
 st.markdown('<h1 class="infection-title">Infection Prevention Assistant</h1>', unsafe_allow_html=True)
+TIMER.first_render()
+
+try:
+    get_backend()
+except MissingApiKeyError:
+    st.error(":material/error: Gemini API key not found. Please set it in your Streamlit secrets.")
+    st.stop()
+
+# Session state for this page lives under its own namespace.
+STATE = page_state("infection")
 
 # --- GEMINI PROMPT & MODEL CONFIGURATION ---
 # This detailed system prompt guides the AI to function as a medical expert.
@@ -83,94 +92,363 @@ Your entire response must be in Markdown.
 * (e.g., "The umbilical cord image shows significant periumbilical erythema and purulent discharge, consistent with omphalitis.")
 """
 
-def get_gemini_response(prompt_text, images):
+def get_gemini_response(prompt_text, images, route, cache_key=None):
     """
-    Sends a prompt with optional images to the Gemini model and returns the response.
+    Sends a prompt with optional images to the model picked by `route` and returns the response.
+    When `cache_key` is given, identical requests are answered from the shared
+    response cache and concurrent duplicates share a single upstream call.
     """
     if not prompt_text:
         return "Please fill in the clinical data to get an analysis."
 
-    model = genai.GenerativeModel('gemini-1.5-pro-latest')
+    # The instruction is the model's system instruction, so it can be served
+    # from the context cache instead of being resent as a content part.
+    model = get_model(route.model, SYSTEM_INSTRUCTION)
     
     # The content payload must be a list
-    content = [SYSTEM_INSTRUCTION, prompt_text]
+    content = [prompt_text]
     if images:
         for img in images.values():
             content.append(img)
             
+    cache = get_response_cache()
     try:
-        response = model.generate_content(content)
-        return response.text
+        with get_telemetry().span("infection", route.task, model=model_cache_id(route.model), tier=route.tier,
+                                  contents=content) as span:
+            def generate():
+                return span.call(lambda: model.generate_content(content), fallback=cache.fallback(cache_key)).text
+
+            if cache_key is None:
+                return generate()
+            text, hit = cache.get_or_compute(cache_key, generate)
+            span.cache_hit(hit)
+        if hit:
+            st.toast("Showing a saved analysis for identical patient data.", icon=":material/bolt:")
+        return text
     except Exception as e:
         st.error(f"An error occurred during API call: {e}")
         return None
 
+# Clinical/lab user prompt, compiled once and whitespace-normalised; bump the
+# version when the wording changes. Its canonical key identifies the request.
+ANALYSIS_PROMPT = prompt_template("infection.analysis", 1, """
+    Analyze the following neonatal data for signs of sepsis or shock:
+
+    **A. Clinical and Vital Signs:**
+    - Infant Age: {clinical[age]} days
+    - Birth Weight: {clinical[birth_weight]} kg
+    - Current Weight: {clinical[current_weight]} kg
+    - Gestational Age: {clinical[gestational_age]} weeks
+    - Feeding Status: {clinical[feeding_status]}
+    - Temperature: {clinical[temperature]} °C
+    - Heart Rate: {clinical[heart_rate]} bpm
+    - Respiratory Rate: {clinical[resp_rate]} breaths/min
+    - Capillary Refill Time: {clinical[cap_refill]} seconds
+    - Skin Perfusion: {clinical[skin_perfusion]}
+    - Lethargy/Irritability: {lethargy}
+    - Urine Output: {clinical[urine_output]} ml/kg/hr
+    - SpO2: {clinical[spo2]}%
+    - Blood Pressure: {clinical[bp_systolic]}/{clinical[bp_diastolic]} mmHg
+
+    **B. Lab/Diagnostic Parameters:**
+    - Blood pH: {lab[ph]}
+    - Lactate: {lab[lactate]} mmol/L
+    - CRP: {lab[crp]} mg/L
+    - WBC Count: {lab[wbc]} x10^9/L
+    - Platelet Count: {lab[platelets]} x10^9/L
+    - Blood Culture: {lab[blood_culture]}
+    - Procalcitonin: {lab[procalcitonin]} ng/mL
+    - Glucose: {lab[glucose]} mg/dL
+""")
+
+# --- PARALLEL IMAGE ANALYSIS ---
+# Each uploaded image is interpreted by its own sub-request, concurrently with
+# the core text assessment, so the report no longer waits on one large call.
+PARALLEL_ANALYSIS = True
+CORE_TASK_TIMEOUT_SECONDS = 90
+IMAGE_TASK_TIMEOUT_SECONDS = 45
+
+IMAGE_LABELS = {'umbilical': "Umbilical Cord", 'skin': "Skin Rash/Pustule", 'xray': "Chest X-ray"}
+IMAGE_PROMPTS = {
+    'umbilical': "You are assisting a neonatologist. This is an image of a newborn's umbilical cord stump. "
+                 "In 2-4 concise Markdown bullet points, describe any visual signs of omphalitis "
+                 "(periumbilical redness, swelling, purulent discharge) or state that none are visible.",
+    'skin': "You are assisting a neonatologist. This is an image of a newborn's skin. "
+            "In 2-4 concise Markdown bullet points, describe any sepsis-related findings "
+            "(pustules, petechiae, purpura, mottling) or state that none are visible.",
+    'xray': "You are assisting a neonatologist. This is a neonatal chest X-ray. "
+            "In 2-4 concise Markdown bullet points, describe any signs of pneumonia "
+            "(infiltrates, consolidation, effusion) or state that none are visible.",
+}
+TASK_FAILURE_TEXT = {"timeout": "_Timed out; not included in this report._", "error": "_Could not be analysed: {error}_"}
+
+
+def get_parallel_analysis(prompt_text, images, cache_keys, routes, on_result=None, on_queue=None):
+    """
+    Runs the core clinical/lab assessment and one interpretation per image as
+    concurrent sub-requests with per-task timeouts, then merges them into one
+    report. Each sub-request is cached on its own, so changing one image only
+    re-runs that image, and runs on the model in `routes[name]`.
+    `on_result(name, status, value)` sees partial results, and
+    `on_queue(waiting)` the sub-requests still queued for a model call slot
+    (a scheduler.QueueBoard snapshot), both on the calling thread.
+    """
+    # Resolved here: the worker threads have no Streamlit script context.
+    models = {name: (get_model(route.model, SYSTEM_INSTRUCTION if name == 'core' else None), model_cache_id(route.model))
+              for name, route in routes.items()}
+    cache, limiter, breaker = get_response_cache(), get_rate_limiter(), get_circuit_breaker()
+    telemetry, session = get_telemetry(), current_session()
+    queue = QueueBoard()
+
+    def make_task(name, endpoint, cache_key, content):
+        model, model_id = models[name]
+
+        def task():
+            with telemetry.span("infection", endpoint, model=model_id, tier=routes[name].tier, contents=content,
+                                session=session, on_wait=queue.reporter(name)) as span:
+                def generate():
+                    return span.call(lambda: model.generate_content(content), limiter=limiter, breaker=breaker,
+                                     fallback=cache.fallback(cache_key)).text
+                text, hit = cache.get_or_compute(cache_key, generate)
+                span.cache_hit(hit)
+                return text
+        return task
+
+    if images:
+        prompt_text += "\n(Uploaded images are interpreted separately; leave out section 4.)"
+    tasks = {'core': make_task('core', "analysis", cache_keys['core'], [prompt_text])}
+    timeouts = {'core': CORE_TASK_TIMEOUT_SECONDS}
+    for name, part in images.items():
+        tasks[name] = make_task(name, f"image:{name}", cache_keys[name], [IMAGE_PROMPTS[name], part])
+        timeouts[name] = IMAGE_TASK_TIMEOUT_SECONDS
+
+    on_poll = (lambda: on_queue(queue.waiting())) if on_queue is not None else None
+    results = run_parallel(tasks, on_result=on_result, timeouts=timeouts, on_poll=on_poll)
+    return merge_analysis(results)
+
+
+def describe_task_result(status, value):
+    if status == "done":
+        return value
+    return TASK_FAILURE_TEXT[status].format(error=value)
+
+
+def merge_analysis(results):
+    """Combines the core assessment and per-image findings into the final report."""
+    status, value = results['core']
+    if status == "done":
+        report = [value.rstrip()]
+    else:
+        report = [f"### 🏥 AI-Powered Sepsis Risk Assessment\n\n**Clinical assessment:** {describe_task_result(status, value)}"]
+    image_results = [(name, result) for name, result in results.items() if name != 'core']
+    if image_results:
+        report.append("**4. Image Analysis:**")
+        for name, (status, value) in image_results:
+            report.append(f"**{IMAGE_LABELS[name]}:**\n\n{describe_task_result(status, value)}")
+    return "\n\n".join(report)
+
+
+def render_prescreen(score):
+    """Shows the local rule-based pre-screen: risk tier, organ sub-scores and raised flags."""
+    with st.container(border=True):
+        st.markdown("**Rule-based Pre-screen** (computed locally, nSOFA-style)")
+        cols = st.columns(len(SUBSCORES) + 2)
+        cols[0].metric("Risk", score['risk'].replace(" Risk", ""))
+        cols[1].metric("Total", score['total'])
+        for col, name in zip(cols[2:], SUBSCORES):
+            col.metric(name.title(), score['subscores'][name])
+        if score['flags']:
+            st.markdown(" · ".join(f":red[{flag}]" for flag in score['flags']))
+        else:
+            st.caption("No parameters outside the screening thresholds.")
+
+
+# --- PATIENT INPUTS ---
+# Defaults are materialised into session state once, so analysis works even if
+# a tab was never opened. Widget values live under their own keys and are
+# synced with these dicts, so hidden tabs keep their values.
+CLINICAL_DEFAULTS = {
+    'age': 7, 'birth_weight': 3.0, 'current_weight': 3.1, 'gestational_age': 40,
+    'feeding_status': "Exclusive Breastfeeding", 'temperature': 37.5, 'heart_rate': 160,
+    'resp_rate': 50, 'cap_refill': 2, 'skin_perfusion': "Normal", 'lethargy': False,
+    'urine_output': 1.5, 'spo2': 98, 'bp_systolic': 70, 'bp_diastolic': 40,
+}
+LAB_DEFAULTS = {
+    'ph': 7.35, 'lactate': 1.5, 'crp': 5, 'wbc': 10, 'platelets': 250,
+    'blood_culture': "Not Available", 'procalcitonin': 0.5, 'glucose': 90,
+}
+IMAGE_UPLOADS = {
+    'uploaded_umbilical': "Upload Umbilical Cord Image",
+    'uploaded_skin': "Upload Skin Rash/Pustule Image",
+    'uploaded_xray': "Upload Chest X-ray Image",
+}
+INPUT_GROUPS = {'clinical_data': CLINICAL_DEFAULTS, 'lab_data': LAB_DEFAULTS}
+
+
+def input_key(group, field):
+    return STATE.key(f"{group}.{field}")
+
+
+def materialise_inputs():
+    """
+    Seeds the input dicts on first use and syncs them with the widget keys.
+    Re-assigning the keys also stops Streamlit from discarding the state of
+    widgets on tabs that are not rendered in this run.
+    """
+    for group, defaults in INPUT_GROUPS.items():
+        data = STATE.setdefault(group, dict(defaults))
+        for field in defaults:
+            key = input_key(group, field)
+            data[field] = st.session_state.get(key, data[field])
+            st.session_state[key] = data[field]
+    STATE.setdefault('image_data', dict.fromkeys(IMAGE_UPLOADS))
+
+
+@st.fragment
 def clinic_page():
     st.subheader("A. Clinical and Vital Signs")
+    data = STATE.clinical_data
+    key = lambda field: input_key('clinical_data', field)
     col1, col2, col3 = st.columns(3)
     with col1:
-        age = st.number_input("Infant Age (days)", min_value=0, max_value=90, value=7, step=1)
-        birth_weight = st.number_input("Birth Weight (kg)", min_value=0.5, max_value=10.0, value=3.0, step=0.1)
-        current_weight = st.number_input("Current Weight (kg)", min_value=0.5, max_value=10.0, value=3.1, step=0.1)
-        gestational_age = st.number_input("Gestational Age at Birth (weeks)", min_value=22, max_value=45, value=40, step=1)
-        feeding_status = st.selectbox("Feeding Status", ["Exclusive Breastfeeding", "Mixed Feeding", "Formula-fed"])
+        data['age'] = st.number_input("Infant Age (days)", min_value=0, max_value=90, step=1, key=key('age'))
+        data['birth_weight'] = st.number_input("Birth Weight (kg)", min_value=0.5, max_value=10.0, step=0.1, key=key('birth_weight'))
+        data['current_weight'] = st.number_input("Current Weight (kg)", min_value=0.5, max_value=10.0, step=0.1, key=key('current_weight'))
+        data['gestational_age'] = st.number_input("Gestational Age at Birth (weeks)", min_value=22, max_value=45, step=1, key=key('gestational_age'))
+        data['feeding_status'] = st.selectbox("Feeding Status", ["Exclusive Breastfeeding", "Mixed Feeding", "Formula-fed"], key=key('feeding_status'))
     with col2:
-        temperature = st.number_input("Temperature (°C)", min_value=34.0, max_value=42.0, value=37.5, step=0.1)
-        heart_rate = st.number_input("Heart Rate (bpm)", min_value=50, max_value=250, value=160, step=1)
-        resp_rate = st.number_input("Respiratory Rate (breaths/min)", min_value=10, max_value=100, value=50, step=1)
-        cap_refill = st.number_input("Capillary Refill Time (seconds)", min_value=1, max_value=10, value=2, step=1)
-        skin_perfusion = st.selectbox("Skin Perfusion/Mottling", ["Normal", "Pale", "Mottled", "Cyanotic"])
+        data['temperature'] = st.number_input("Temperature (°C)", min_value=34.0, max_value=42.0, step=0.1, key=key('temperature'))
+        data['heart_rate'] = st.number_input("Heart Rate (bpm)", min_value=50, max_value=250, step=1, key=key('heart_rate'))
+        data['resp_rate'] = st.number_input("Respiratory Rate (breaths/min)", min_value=10, max_value=100, step=1, key=key('resp_rate'))
+        data['cap_refill'] = st.number_input("Capillary Refill Time (seconds)", min_value=1, max_value=10, step=1, key=key('cap_refill'))
+        data['skin_perfusion'] = st.selectbox("Skin Perfusion/Mottling", ["Normal", "Pale", "Mottled", "Cyanotic"], key=key('skin_perfusion'))
     with col3:
-        lethargy = st.checkbox("Lethargy or Irritability")
-        urine_output = st.number_input("Urine Output (ml/kg/hr)", min_value=0.0, max_value=10.0, value=1.5, step=0.1)
-        spo2 = st.number_input("Oxygen Saturation (SpO2 %)", min_value=70, max_value=100, value=98, step=1)
-        bp_systolic = st.number_input("Blood Pressure - Systolic (mmHg, optional)", min_value=0, max_value=150, value=70, step=1)
-        bp_diastolic = st.number_input("Blood Pressure - Diastolic (mmHg, optional)", min_value=0, max_value=100, value=40, step=1)
-    
-    # Store in session state
-    st.session_state.clinical_data = {
-        'age': age, 'birth_weight': birth_weight, 'current_weight': current_weight,
-        'gestational_age': gestational_age, 'feeding_status': feeding_status,
-        'temperature': temperature, 'heart_rate': heart_rate, 'resp_rate': resp_rate,
-        'cap_refill': cap_refill, 'skin_perfusion': skin_perfusion, 'lethargy': lethargy,
-        'urine_output': urine_output, 'spo2': spo2, 'bp_systolic': bp_systolic,
-        'bp_diastolic': bp_diastolic
-    }
+        data['lethargy'] = st.checkbox("Lethargy or Irritability", key=key('lethargy'))
+        data['urine_output'] = st.number_input("Urine Output (ml/kg/hr)", min_value=0.0, max_value=10.0, step=0.1, key=key('urine_output'))
+        data['spo2'] = st.number_input("Oxygen Saturation (SpO2 %)", min_value=70, max_value=100, step=1, key=key('spo2'))
+        data['bp_systolic'] = st.number_input("Blood Pressure - Systolic (mmHg, optional)", min_value=0, max_value=150, step=1, key=key('bp_systolic'))
+        data['bp_diastolic'] = st.number_input("Blood Pressure - Diastolic (mmHg, optional)", min_value=0, max_value=100, step=1, key=key('bp_diastolic'))
 
+@st.fragment
 def lab_page():
     st.subheader("B. Lab/Diagnostic Parameters")
+    data = STATE.lab_data
+    key = lambda field: input_key('lab_data', field)
     col1, col2, col3 = st.columns(3)
     with col1:
-        ph = st.number_input("Blood pH", min_value=6.8, max_value=7.8, value=7.35, step=0.01)
-        lactate = st.number_input("Lactate (mmol/L)", min_value=0.0, max_value=20.0, value=1.5, step=0.1)
-        crp = st.number_input("CRP (C-reactive protein, mg/L)", min_value=0, max_value=300, value=5, step=1)
+        data['ph'] = st.number_input("Blood pH", min_value=6.8, max_value=7.8, step=0.01, key=key('ph'))
+        data['lactate'] = st.number_input("Lactate (mmol/L)", min_value=0.0, max_value=20.0, step=0.1, key=key('lactate'))
+        data['crp'] = st.number_input("CRP (C-reactive protein, mg/L)", min_value=0, max_value=300, step=1, key=key('crp'))
     with col2:
-        wbc = st.number_input("WBC Count (x10^9/L)", min_value=0, max_value=50, value=10, step=1)
-        platelets = st.number_input("Platelet Count (x10^9/L)", min_value=0, max_value=600, value=250, step=1)
-        blood_culture = st.selectbox("Blood Culture Result", ["Not Available", "Pending", "No Growth", "Growth Detected"])
+        data['wbc'] = st.number_input("WBC Count (x10^9/L)", min_value=0, max_value=50, step=1, key=key('wbc'))
+        data['platelets'] = st.number_input("Platelet Count (x10^9/L)", min_value=0, max_value=600, step=1, key=key('platelets'))
+        data['blood_culture'] = st.selectbox("Blood Culture Result", ["Not Available", "Pending", "No Growth", "Growth Detected"], key=key('blood_culture'))
     with col3:
-        procalcitonin = st.number_input("Procalcitonin (ng/mL, optional)", min_value=0.0, max_value=100.0, value=0.5, step=0.1)
-        glucose = st.number_input("Glucose (mg/dL)", min_value=0, max_value=500, value=90, step=1)
-    
-    # Store in session state
-    st.session_state.lab_data = {
-        'ph': ph, 'lactate': lactate, 'crp': crp, 'wbc': wbc,
-        'platelets': platelets, 'blood_culture': blood_culture,
-        'procalcitonin': procalcitonin, 'glucose': glucose
-    }
+        data['procalcitonin'] = st.number_input("Procalcitonin (ng/mL, optional)", min_value=0.0, max_value=100.0, step=0.1, key=key('procalcitonin'))
+        data['glucose'] = st.number_input("Glucose (mg/dL)", min_value=0, max_value=500, step=1, key=key('glucose'))
 
+def store_upload(slot):
+    # Only a handle (content hash, name, size) stays in session state; the
+    # file itself is spilled to the process-wide upload store.
+    uploaded = st.session_state[input_key('image_data', slot)]
+    try:
+        STATE.image_data[slot] = get_upload_store().put(uploaded) if uploaded is not None else None
+    except OSError:
+        STATE.image_data[slot] = None
+        st.toast("The upload could not be stored; please try again.", icon=":material/error:")
+
+@st.fragment
 def image_page():
     st.subheader("C. Upload Images (Optional)")
-    uploaded_umbilical = st.file_uploader("Upload Umbilical Cord Image", type=["jpg", "png", "jpeg"])
-    uploaded_skin = st.file_uploader("Upload Skin Rash/Pustule Image", type=["jpg", "png", "jpeg"])
-    uploaded_xray = st.file_uploader("Upload Chest X-ray Image", type=["jpg", "png", "jpeg"])
-    
-    # Store in session state
-    st.session_state.image_data = {
-        'uploaded_umbilical': uploaded_umbilical,
-        'uploaded_skin': uploaded_skin,
-        'uploaded_xray': uploaded_xray
-    }
+    # Uploaders can't be re-seeded through session state, so files are kept in
+    # `image_data` by on_change and the stored file is shown when the tab reopens.
+    for slot, label in IMAGE_UPLOADS.items():
+        st.file_uploader(label, type=["jpg", "png", "jpeg"], key=input_key('image_data', slot),
+                         on_change=store_upload, args=(slot,))
+        stored = STATE.image_data.get(slot)
+        if stored is not None and st.session_state.get(input_key('image_data', slot)) is None:
+            st.caption(f":material/attach_file: Using previously uploaded `{stored.name}`")
+
+def batch_page():
+    """Ward mode: triages many neonates from one CSV/Parquet upload."""
+    st.subheader("Ward Batch Triage")
+    st.caption(
+        f"One patient per row, up to {MAX_BATCH_ROWS} rows. Columns: `{ID_COLUMN}` (optional), "
+        + ", ".join(f"`{field}`" + (" (optional)" if field in OPTIONAL_FIELDS else "") for field in FIELDS)
+        + ". Values use the same units and ranges as the Clinical and Lab tabs."
+    )
+    uploaded = st.file_uploader("Upload Patient Records", type=["csv", "parquet"], key=STATE.key("batch_file"))
+    if not uploaded:
+        return
+    try:
+        frame = read_records(uploaded)
+    except ImportError:
+        st.error("Reading Parquet files needs the `pyarrow` package; please upload a CSV instead.")
+        return
+    except (ValueError, OSError) as e:
+        st.error(f"The file could not be read: {e}")
+        return
+
+    records, problems = validate_records(frame)
+    if len(problems):
+        skipped = problems[ID_COLUMN].nunique()
+        st.warning(f"{skipped} patient(s) were skipped because of invalid or missing values.")
+        with st.expander("Validation problems"):
+            st.dataframe(problems, hide_index=True, use_container_width=True)
+    if records.empty:
+        return
+
+    upload_key = (uploaded.file_id, len(records))
+    score_only = st.toggle("Pre-screen only (no AI call)", key=STATE.key("batch_score_only"))
+    status_area, table_area = st.empty(), st.empty()
+    result = STATE.get('batch_result')
+    if result and result['key'] == upload_key:
+        table_area.dataframe(result['table'], hide_index=True, use_container_width=True)
+        status_area.caption(result['status'])
+    else:
+        table_area.dataframe(rank_patients(records, pending=""), hide_index=True, use_container_width=True)
+        status_area.caption(f"{len(records)} patients ranked by the local pre-screen.")
+
+    if score_only or not st.button(":material/groups: Triage Ward", type="primary"):
+        return
+
+    # Resolved here: the worker threads have no Streamlit script context.
+    route = get_model_router().route("plan")
+    model = get_model(route.model, BATCH_INSTRUCTION)
+    queue = QueueBoard()
+    tasks = build_batch_tasks(records, model, model_cache_id(route.model), get_response_cache(),
+                              get_rate_limiter(), get_circuit_breaker(), get_telemetry(), tier=route.tier,
+                              session=current_session(), queue=queue)
+    answers = {}
+    failed = []
+    progress = st.progress(0.0, text="Triaging...")
+    queue_notice = QueueNotice()
+    start = time.monotonic()
+
+    def show_batch(name, status, value):
+        if status == "done":
+            answers.update(value)
+        else:
+            failed.append(name)
+        done = len(answers) + len(failed)
+        progress.progress(done / len(tasks), text=f"{done}/{len(tasks)} requests complete")
+        table_area.dataframe(rank_patients(records, answers), hide_index=True, use_container_width=True)
+
+    run_parallel(tasks, on_result=show_batch, timeouts=dict.fromkeys(tasks, BATCH_TASK_TIMEOUT_SECONDS),
+                 on_poll=lambda: queue_notice.show_waiting(queue.waiting()), max_in_flight=BATCH_MAX_IN_FLIGHT)
+    elapsed = time.monotonic() - start
+    progress.empty()
+    queue_notice.close()
+
+    table = rank_patients(records, answers, pending="No answer")
+    status = (f"{len(records)} patients in {elapsed:.1f} s "
+              f"({len(records) / max(elapsed, 1e-3) * 60:,.0f} patients/min, {len(tasks)} requests).")
+    if failed:
+        status += f" No answer for {', '.join(failed)}."
+    table_area.dataframe(table, hide_index=True, use_container_width=True)
+    status_area.caption(status)
+    STATE.batch_result = {'key': upload_key, 'table': table, 'status': status}
+
 
 # --- UI & APP LOGIC ---
 def sepsis_detector_app():
@@ -186,115 +464,147 @@ def sepsis_detector_app():
         "**Disclaimer:** This is a clinical decision support tool. It is not a substitute for professional medical advice, diagnosis, or treatment. Always seek the advice of a qualified health provider."
     )
 
+    mode = st.radio("Mode", ["Single patient", "Ward batch (CSV/Parquet)"], horizontal=True,
+                    key=STATE.key("mode"), label_visibility="collapsed")
+    if mode != "Single patient":
+        batch_page()
+        return
+
     # Use session state to store the response for a smoother user experience
-    if 'response' not in st.session_state:
-        st.session_state.response = ""
+    if 'response' not in STATE:
+        STATE.response = ""
 
     # --- INPUT SECTION ---
-    # The UI is organized into tabs for clarity, as suggested.
-    if 'active_tab' not in st.session_state:
-        st.session_state.active_tab = ''
-    
+    # The UI is organized into tabs for clarity, as suggested. Only the open
+    # tab's form is built, and each form is a fragment: switching tabs costs a
+    # single rerun and editing a field reruns just that form.
+    materialise_inputs()
+    STATE.setdefault('active_tab', '')
+
     def set_active_tab(tab_name):
-        st.session_state.active_tab = tab_name
+        STATE.active_tab = tab_name
 
     with st.expander("Enter Patient Data and Upload Images", expanded=True):
         col1, col2, col3 = st.columns(3)
-        if col1.button("Clinical & Vital Signs", key="btn_A",use_container_width=True):
-            set_active_tab('CLINIC')
-            st.rerun()
-        if col2.button("Lab Parameters", key="btn_B",use_container_width=True):
-            set_active_tab('LAB')
-            st.rerun()
-        if col3.button("Image Uploads", key="btn_C",use_container_width=True):
-            set_active_tab('IMAGE')
-            st.rerun()
-    
+        for col, tab, label, key in [(col1, 'CLINIC', "Clinical & Vital Signs", "btn_A"),
+                                     (col2, 'LAB', "Lab Parameters", "btn_B"),
+                                     (col3, 'IMAGE', "Image Uploads", "btn_C")]:
+            col.button(label, key=key, use_container_width=True, on_click=set_active_tab, args=(tab,),
+                       type="primary" if STATE.active_tab == tab else "secondary")
+
     # Display content based on active tab
-    if st.session_state.active_tab == 'CLINIC':
+    if STATE.active_tab == 'CLINIC':
         clinic_page()
-    elif st.session_state.active_tab == 'LAB':
+    elif STATE.active_tab == 'LAB':
         lab_page()
-    elif st.session_state.active_tab == 'IMAGE':
+    elif STATE.active_tab == 'IMAGE':
         image_page()
 
     # --- ANALYSIS BUTTON ---
     c1,c2,c3=st.columns([1, 1, 1])
+    score_only = c2.toggle("Score-only (no AI call)", key=STATE.key("score_only"),
+                           help="Run only the local rule-based pre-screen, without contacting the model.")
+    # The pre-screen renders here, above the AI results, as soon as it is computed.
+    prescreen_area = st.container()
+    prescreen_shown = False
     if c2.button(":material/stethoscope: Analyze Patient Data", type="primary",use_container_width=True):
-        # Check if data exists in session state
-        if 'clinical_data' not in st.session_state or 'lab_data' not in st.session_state:
-            st.error("Please fill in all required data in Clinical and Lab tabs before analysis.")
+        STATE.prescreen = score_patient(STATE.clinical_data, STATE.lab_data)
+        with prescreen_area:
+            render_prescreen(STATE.prescreen)
+        prescreen_shown = True
+        if score_only:
+            STATE.response = ""
             return
-            
+
         with st.spinner("AI is analyzing the data... Please wait."):
             # Get data from session state
-            clinical = st.session_state.clinical_data
-            lab = st.session_state.lab_data
-            images_data = st.session_state.get('image_data', {})
+            clinical = STATE.clinical_data
+            lab = STATE.lab_data
+            images_data = STATE.get('image_data', {})
             
             # Format the text prompt with all the patient data
-            prompt = f"""
-            Analyze the following neonatal data for signs of sepsis or shock:
-
-            **A. Clinical and Vital Signs:**
-            - Infant Age: {clinical['age']} days
-            - Birth Weight: {clinical['birth_weight']} kg
-            - Current Weight: {clinical['current_weight']} kg
-            - Gestational Age: {clinical['gestational_age']} weeks
-            - Feeding Status: {clinical['feeding_status']}
-            - Temperature: {clinical['temperature']} °C
-            - Heart Rate: {clinical['heart_rate']} bpm
-            - Respiratory Rate: {clinical['resp_rate']} breaths/min
-            - Capillary Refill Time: {clinical['cap_refill']} seconds
-            - Skin Perfusion: {clinical['skin_perfusion']}
-            - Lethargy/Irritability: {'Yes' if clinical['lethargy'] else 'No'}
-            - Urine Output: {clinical['urine_output']} ml/kg/hr
-            - SpO2: {clinical['spo2']}%
-            - Blood Pressure: {clinical['bp_systolic']}/{clinical['bp_diastolic']} mmHg
-
-            **B. Lab/Diagnostic Parameters:**
-            - Blood pH: {lab['ph']}
-            - Lactate: {lab['lactate']} mmol/L
-            - CRP: {lab['crp']} mg/L
-            - WBC Count: {lab['wbc']} x10^9/L
-            - Platelet Count: {lab['platelets']} x10^9/L
-            - Blood Culture: {lab['blood_culture']}
-            - Procalcitonin: {lab['procalcitonin']} ng/mL
-            - Glucose: {lab['glucose']} mg/dL
-            """
+            rendered = ANALYSIS_PROMPT.render(clinical=clinical, lab=lab, lethargy='Yes' if clinical['lethargy'] else 'No')
+            prompt = rendered.text
 
             # Prepare images for the API call
+            # Uploads are downsized and re-encoded first; results are cached by content hash.
             images = {}
-            if images_data.get('uploaded_umbilical'):
-                images['umbilical'] = Image.open(images_data['uploaded_umbilical'])
-            if images_data.get('uploaded_skin'):
-                images['skin'] = Image.open(images_data['uploaded_skin'])
-            if images_data.get('uploaded_xray'):
-                images['xray'] = Image.open(images_data['uploaded_xray'])
-
-            # Get response from Gemini
-            st.session_state.response = get_gemini_response(prompt, images)
+            image_digests = {}
+            for name, key in [('umbilical', 'uploaded_umbilical'), ('skin', 'uploaded_skin'), ('xray', 'uploaded_xray')]:
+                if images_data.get(key):
+                    try:
+                        prepared = prepare_stored(images_data[key])
+                    except UploadExpiredError:
+                        st.error(f"The {name} upload has expired and was skipped. Please upload it again.")
+                        continue
+                    except OSError:
+                        st.error(f"The {name} upload could not be read as an image and was skipped.")
+                        continue
+                    images[name] = prepared.as_part()
+                    image_digests[name] = prepared.digest
+                    st.caption(f"{name.title()} image — {prepared.summary()}")
+
+            # Get response from Gemini, on the model tier picked per task (model_router.py)
+            router = get_model_router()
+            if not PARALLEL_ANALYSIS:
+                route = router.route("image_analysis" if images else "plan", prompt, images=len(images))
+                cache_key = canonical_key(model_cache_id(route.model), SYSTEM_INSTRUCTION, rendered.key, image_digests)
+                STATE.response = get_gemini_response(prompt, images, route, cache_key)
+            else:
+                routes = {'core': router.route("plan", prompt)}
+                routes.update((name, router.route("image_analysis", images=1)) for name in images)
+                cache_keys = {'core': canonical_key(model_cache_id(routes['core'].model), SYSTEM_INSTRUCTION,
+                                                    rendered.key, sorted(images))}
+                for name, digest in image_digests.items():
+                    cache_keys[name] = canonical_key(model_cache_id(routes[name].model), IMAGE_PROMPTS[name], digest)
+
+                # Partial results render here as each sub-request completes.
+                live = st.empty()
+                with live.container():
+                    queue_notice = QueueNotice(st.empty())
+                    placeholders = {'core': st.empty()}
+                    placeholders['core'].info("Assessing clinical and lab data...", icon=":material/hourglass_top:")
+                    for name in images:
+                        placeholders[name] = st.empty()
+                        placeholders[name].info(f"Interpreting {IMAGE_LABELS[name]} image...", icon=":material/hourglass_top:")
+
+                def show_partial(name, status, value):
+                    title = "Clinical assessment" if name == 'core' else f"{IMAGE_LABELS[name]} image"
+                    with placeholders[name].container(border=True):
+                        st.markdown(f"**{title}**")
+                        st.markdown(describe_task_result(status, value))
+
+                STATE.response = get_parallel_analysis(prompt, images, cache_keys, routes, on_result=show_partial,
+                                                       on_queue=queue_notice.show_waiting)
+                live.empty()
 
     # --- OUTPUT SECTION ---
-    if st.session_state.response:
+    if not prescreen_shown and STATE.get('prescreen'):
+        with prescreen_area:
+            render_prescreen(STATE.prescreen)
+
+    if STATE.response:
         st.markdown("---")
         st.subheader("Analysis Results")
 
         col1, col2 = st.columns([0.6, 0.4])
 
         with col1:
-            st.markdown(st.session_state.response)
+            st.markdown(STATE.response)
 
         with col2:
-            images_data = st.session_state.get('image_data', {})
-            if images_data.get('uploaded_umbilical'):
-                st.image(images_data['uploaded_umbilical'], caption="Uploaded Umbilical Image", use_container_width=True)
-            if images_data.get('uploaded_skin'):
-                st.image(images_data['uploaded_skin'], caption="Uploaded Skin Image", use_container_width=True)
-            if images_data.get('uploaded_xray'):
-                st.image(images_data['uploaded_xray'], caption="Uploaded Chest X-ray", use_container_width=True)
+            # Small shared thumbnails, not the originals, are sent for display.
+            images_data = STATE.get('image_data', {})
+            for slot, caption in [('uploaded_umbilical', "Uploaded Umbilical Image"),
+                                  ('uploaded_skin', "Uploaded Skin Image"),
+                                  ('uploaded_xray', "Uploaded Chest X-ray")]:
+                thumbnail = images_data[slot].thumbnail() if images_data.get(slot) else None
+                if thumbnail:
+                    st.image(thumbnail, caption=caption, use_container_width=True)
 
 
 if __name__ == "__main__":
     sepsis_detector_app()
-                
\ No newline at end of file
+    # Load the model client and heavy libraries in the background after first paint.
+    start_background_warmup()
+    TIMER.finish()
@@ -1,107 +1,39 @@
 import streamlit as st
-import google.generativeai as genai
-from PIL import Image
 from navigation import render_navigation_buttons
+from theme import apply_theme
+from page_timing import start_page_timer
+from telemetry import get_telemetry
+from model_router import get_model_router
+from prompt_templates import prompt_template
+from session_store import page_state
+from image_preprocess import prepare_stored
+from upload_store import get_upload_store
+from gemini_client import MissingApiKeyError, get_backend, get_model, model_cache_id, start_background_warmup
+from response_cache import canonical_key, get_response_cache
+
+# Times each run of this page; see page_timing.py.
+TIMER = start_page_timer("umbilical")
 
 st.set_page_config(page_title="Umbilical Cord Assistant", layout="wide", initial_sidebar_state="expanded")
 
-# Custom CSS for professional umbilical care page
-st.markdown("""
-<style>
-    /* Page-specific styling */
-    .umbilical-container {
-        background: #F8FAFE;
-        padding: 20px;
-        border-radius: 12px;
-        margin: 15px 0;
-        border: 1px solid #E1E8ED;
-        box-shadow: 0 2px 8px rgba(91, 155, 213, 0.08);
-    }
-    
-    .umbilical-title {
-        color: #5B9BD5;
-        text-align: center;
-        font-size: 2.2rem;
-        font-weight: 600;
-        margin: 20px 0;
-    }
-    
-    /* Upload area styling */
-    .stFileUploader {
-        background: #FFFFFF !important;
-        border: 2px dashed #5B9BD5 !important;
-        border-radius: 8px !important;
-        padding: 15px !important;
-    }
-    
-    .stFileUploader label {
-        color: #5B9BD5 !important;
-        font-weight: 600 !important;
-        font-size: 1rem !important;
-    }
-    
-    /* Checkbox styling */
-    .stCheckbox label {
-        color: #5B9BD5 !important;
-        font-weight: 600 !important;
-        font-size: 0.95rem !important;
-    }
-    
-    /* Analysis button */
-    .stButton > button {
-        background: #5B9BD5 !important;
-        color: white !important;
-        border: 1px solid #5B9BD5 !important;
-        border-radius: 8px !important;
-        font-weight: 600 !important;
-        font-size: 1.1rem !important;
-        padding: 12px 25px !important;
-        transition: all 0.2s ease !important;
-        box-shadow: 0 2px 4px rgba(91, 155, 213, 0.2) !important;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-1px) !important;
-        box-shadow: 0 4px 8px rgba(91, 155, 213, 0.25) !important;
-        background: #4A90E2 !important;
-    }
-    
-    /* Section headers */
-    .section-header {
-        color: #5B9BD5;
-        font-size: 1.3rem;
-        font-weight: 600;
-        margin: 20px 0 12px 0;
-        border-bottom: 1px solid #E1E8ED;
-        padding-bottom: 5px;
-    }
-    
-    /* Results container */
-    .results-container {
-        background: #FFFFFF;
-        padding: 15px;
-        border-radius: 8px;
-        border: 1px solid #E1E8ED;
-        margin: 15px 0;
-        box-shadow: 0 1px 3px rgba(0, 0, 0, 0.05);
-    }
-    
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for professional umbilical care page (styles/umbilical.css)
+apply_theme("umbilical")
 
 render_navigation_buttons()
 
 # Professional title
 st.markdown('<h1 class="umbilical-title">Umbilical Care Assistant</h1>', unsafe_allow_html=True)
+TIMER.first_render()
 
 try:
-    # Per your request: gemini_key = st.secrets["gemini_api_key"]["GEMINI_API_KEY"]
-    gemini_key = st.secrets["gemini_api_key"]["GEMINI_API_KEY"]
-    genai.configure(api_key=gemini_key)
-except (KeyError, TypeError):
+    get_backend()
+except MissingApiKeyError:
     st.error(":material/error: Gemini API key not found. Please set it in your Streamlit secrets.")
     st.stop()
 
+# Session state for this page lives under its own namespace.
+STATE = page_state("umbilical")
+
 # --- GEMINI PROMPT & MODEL CONFIGURATION ---
 # This system prompt is expertly crafted to guide the Gemini model to act as a
 # neonatal specialist. It focuses on analyzing an umbilical cord image and related
@@ -141,19 +73,38 @@ Your entire response must be in Markdown and follow this exact structure. Do not
 * **General Care Tip:** Always include a tip on proper cord care, like "Ensure the diaper is folded below the cord to allow it to air dry."
 """
 
-def get_gemini_response(prompt_text, image):
+# User prompt sent with the image; whitespace-normalised and compiled once.
+ASSESSMENT_PROMPT = prompt_template("umbilical.assessment", 1, """
+    Please analyze the uploaded image of a neonatal umbilical cord based on the following reported symptoms and provide a health assessment.
+
+    **Reported Symptoms:** {symptoms}
+    **Other Observations:** {observations}
+""")
+
+def get_gemini_response(prompt_text, image, route, cache_key=None):
     """
-    Sends a prompt and an image to the Gemini Pro Vision model for analysis.
+    Sends a prompt and an image to the model picked by `route` for analysis.
+    Identical requests (same `cache_key`) are served from the shared response cache.
     """
     if not image:
         return "Please upload an image for analysis."
     
-    model = genai.GenerativeModel('gemini-1.5-pro-latest')
-    
+    model = get_model(route.model, SYSTEM_INSTRUCTION)
+    # The content payload must be a list containing the text prompt and the image
+    content = [prompt_text, image]
+
+    cache = get_response_cache()
     try:
-        # The content payload must be a list containing the text prompt and the image
-        response = model.generate_content([prompt_text, image])
-        return response.text
+        with get_telemetry().span("umbilical", route.task, model=model_cache_id(route.model), tier=route.tier,
+                                  contents=content) as span:
+            def generate():
+                return span.call(lambda: model.generate_content(content), fallback=cache.fallback(cache_key)).text
+
+            if cache_key is None:
+                return generate()
+            text, hit = cache.get_or_compute(cache_key, generate)
+            span.cache_hit(hit)
+            return text
     except Exception as e:
         st.error(f"An error occurred during the API call: {e}")
         return "Analysis failed. Please ensure the uploaded image is in a standard format (JPG, PNG) and try again."
@@ -190,37 +141,55 @@ def umbilical_cord_analyzer_app():
 
     with col1:
         st.subheader("Uploaded Image")
+        image = upload = None
         if uploaded_image:
-            image = Image.open(uploaded_image)
-            st.image(image, caption="Image of the umbilical cord for analysis.", use_container_width=True)
-        else:
+            try:
+                # Spilled to disk once per file; reruns reuse the stored hash.
+                upload = get_upload_store().put(uploaded_image)
+                image = prepare_stored(upload)
+            except OSError:
+                st.error("This file could not be read as an image. Please upload a JPG or PNG photo.")
+        if image:
+            # The small shared thumbnail is sent for display, not the prepared image.
+            thumbnail = upload.thumbnail()
+            if thumbnail:
+                st.image(thumbnail, caption="Image of the umbilical cord for analysis.", use_container_width=True)
+            st.caption(image.summary())
+        elif not uploaded_image:
             st.info("Please upload an image using the sidebar to begin the analysis.")
 
+    symptoms = {
+        "Redness/Discoloration": symptom_redness,
+        "Foul Odor": symptom_odor,
+        "Swelling/Puffiness": symptom_swelling,
+        "Pus/Discharge": symptom_discharge,
+    }
+    symptoms_list = [name for name, checked in symptoms.items() if checked]
+    rendered = ASSESSMENT_PROMPT.render(symptoms=', '.join(symptoms_list) or "None reported.",
+                                        observations=other_observations.strip() or "None.")
+    # Model tier for the analysis; see model_router.py.
+    route = get_model_router().route("image_analysis", rendered.text, images=1 if image else 0)
+    # Identifies this exact analysis request; unchanged inputs reuse the last result.
+    cache_key = canonical_key(model_cache_id(route.model), SYSTEM_INSTRUCTION, rendered.key,
+                              image.digest if image else None)
+
     with col2:
         st.subheader("AI-Powered Analysis")
-        if st.button(":material/science: Analyze Cord Health", disabled=not uploaded_image):
+        if st.button(":material/science: Analyze Cord Health", disabled=not image):
             with st.spinner("The AI is analyzing the image and symptoms..."):
-                # Constructing the detailed prompt for the AI
-                symptoms_list = []
-                if symptom_redness: symptoms_list.append("Redness/Discoloration")
-                if symptom_odor: symptoms_list.append("Foul Odor")
-                if symptom_swelling: symptoms_list.append("Swelling/Puffiness")
-                if symptom_discharge: symptoms_list.append("Pus/Discharge")
-
-                prompt = f"""
-                Please analyze the uploaded image of a neonatal umbilical cord based on the following reported symptoms and provide a health assessment.
-
-                **Reported Symptoms:** {', '.join(symptoms_list) if symptoms_list else "None reported."}
-                **Other Observations:** {other_observations if other_observations else "None."}
-                """
-
                 # Calling the Gemini API with the prompt and image
-                response_text = get_gemini_response(prompt, image)
-                st.markdown(response_text)
+                response_text = get_gemini_response(rendered.text, image.as_part(), route, cache_key)
+                STATE.analysis = {"key": cache_key, "text": response_text}
+
+        analysis = STATE.get("analysis")
+        if analysis and analysis["key"] == cache_key:
+            st.markdown(analysis["text"])
         else:
             st.info("Click the 'Analyze Cord Health' button after uploading an image.")
 
 
 if __name__ == "__main__":
     umbilical_cord_analyzer_app()
-
+    # Load the model client and heavy libraries in the background after first paint.
+    start_background_warmup()
+    TIMER.finish()
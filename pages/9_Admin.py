@@ -0,0 +1,140 @@
+import time
+
+import streamlit as st
+from navigation import render_navigation_buttons
+from theme import apply_theme
+from gemini_client import MissingApiKeyError, get_context_cache
+from lazy_imports import lazy_import
+from page_timing import get_page_timings
+from conversation_store import RETENTION_SECONDS, get_conversation_store
+from upload_store import get_upload_store
+from telemetry import PERCENTILES, get_telemetry, summarize_spans
+from scheduler import PRIORITIES, get_scheduler
+
+pd = lazy_import("pandas")
+
+# --- PAGE CONFIG ---
+# Not linked from the navigation; open /Admin directly. The page stays locked
+# until an `admin_token` secret is set, and the URL must carry it as `?token=...`.
+st.set_page_config(page_title="Admin · Telemetry", layout="wide")
+
+apply_theme("admin")
+
+render_navigation_buttons()
+
+st.title("Model Call Telemetry")
+
+try:
+    ADMIN_TOKEN = st.secrets.get("admin_token")
+except FileNotFoundError:
+    ADMIN_TOKEN = None
+if not ADMIN_TOKEN:
+    st.error(":material/lock: This page is disabled until an `admin_token` secret is configured.")
+    st.stop()
+if st.query_params.get("token") != ADMIN_TOKEN:
+    st.error(":material/lock: This page needs a valid `?token=` query parameter.")
+    st.stop()
+
+WINDOWS = {"Last hour": 60 * 60, "Last 24 hours": 24 * 60 * 60, "Last 7 days": 7 * 24 * 60 * 60, "All": None}
+
+
+def page_timing_table():
+    """p50/p95/p99 time to first render and total run time per page, this process only."""
+    store = get_page_timings()
+    rows = []
+    for page in store.pages():
+        samples = pd.DataFrame(store.samples(page))
+        row = {'page': page, 'runs': len(samples), 'cold_runs': int(samples['cold'].sum())}
+        for q in PERCENTILES:
+            row[f"ttfr_p{round(q * 100)}_ms"] = samples['first_render_ms'].quantile(q)
+            row[f"total_p{round(q * 100)}_ms"] = samples['total_ms'].quantile(q)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+window = st.selectbox("Time window", list(WINDOWS), index=1)
+seconds = WINDOWS[window]
+telemetry = get_telemetry()
+records = telemetry.sink.read(since=None if seconds is None else time.time() - seconds)
+
+st.subheader("Model calls by page and endpoint")
+st.caption(f"{len(records)} calls from `{telemetry.sink.path}` and its rotated files. "
+           "Latency percentiles cover cache misses only; cache hits never reach the model.")
+summary = summarize_spans(records)
+if summary.empty:
+    st.info("No model calls recorded in this window yet.")
+else:
+    st.dataframe(
+        summary, hide_index=True, use_container_width=True,
+        column_config={
+            'error_rate': st.column_config.NumberColumn(format="percent"),
+            'cache_hit_rate': st.column_config.NumberColumn(format="percent"),
+            'fallback_rate': st.column_config.NumberColumn(format="percent"),
+            'image_kb': st.column_config.NumberColumn(format="%.0f"),
+        },
+    )
+    st.subheader("Model calls by tier")
+    st.caption("Tiers are picked per task by model_router.py; `fallback_rate` is the share of calls "
+               "re-run on the pro tier after a cheaper tier's reply failed validation.")
+    st.dataframe(summarize_spans(records, by=("tier", "model")), hide_index=True, use_container_width=True,
+                 column_config={'fallback_rate': st.column_config.NumberColumn(format="percent")})
+    with st.expander("Most recent calls"):
+        st.dataframe(pd.DataFrame.from_records(records[-200:][::-1]), hide_index=True, use_container_width=True)
+
+st.subheader("Model call scheduler")
+st.caption(f"At most {get_scheduler().capacity} model calls run at once across all sessions; the rest queue by "
+           "priority (lower first), then favour sessions with fewer calls in flight and served less recently. "
+           "Queue time per call is recorded in telemetry as `queue_ms` and `queue_depth`.")
+scheduler_stats = get_scheduler().stats(PERCENTILES)
+in_flight, queued, wait_p95, timed_out = st.columns(4)
+in_flight.metric("In flight", f"{scheduler_stats['in_flight']} / {scheduler_stats['capacity']}")
+queued.metric("Queue depth", scheduler_stats["queue_depth"])
+wait_p95.metric("Wait p95", "–" if scheduler_stats["wait_p95_s"] is None else f"{scheduler_stats['wait_p95_s']:.1f}s")
+timed_out.metric("Timed out in queue", scheduler_stats["timed_out"])
+with st.expander("Scheduler details"):
+    st.json(scheduler_stats)
+    st.caption("Priorities: " + ", ".join(f"`{name}` {level}" for name, level in PRIORITIES.items()))
+
+st.subheader("Page render timings")
+st.caption("Collected in memory by this server process since it started.")
+timings = page_timing_table()
+if timings.empty:
+    st.info("No page runs recorded yet.")
+else:
+    st.dataframe(timings, hide_index=True, use_container_width=True)
+
+st.subheader("Context cache")
+try:
+    context_cache = get_context_cache()
+except MissingApiKeyError:
+    st.info("No model backend is configured.")
+else:
+    st.caption("System instructions registered with the backend's cached-content API by this server process. "
+               "`cached_tokens` above shows how much of each prompt was served from it.")
+    created, refreshed, invalidated = st.columns(3)
+    created.metric("Registered", context_cache.created)
+    refreshed.metric("TTL refreshes", context_cache.refreshed)
+    invalidated.metric("Re-created after expiry", context_cache.invalidated)
+
+st.subheader("Conversation store")
+st.caption(f"Chat histories are kept on disk, and deleted once a conversation has had no new message for "
+           f"{RETENTION_SECONDS // (24 * 60 * 60)} days; sessions hold only their recent window in memory "
+           "and drop it after sitting idle. Counts cover this server process.")
+conversation_stats = get_conversation_store().stats()
+live, resident, in_memory, evicted, purged = st.columns(5)
+live.metric("Conversations", conversation_stats["conversations"])
+resident.metric("Held in memory", conversation_stats["resident"])
+in_memory.metric("Messages in memory", conversation_stats["messages_in_memory"])
+evicted.metric("Evicted when idle", conversation_stats["evicted"])
+purged.metric("Messages expired", conversation_stats["purged_messages"])
+
+st.subheader("Upload store")
+st.caption("Uploaded images are kept on disk, one file per distinct content; sessions hold only "
+           "a content hash. Thumbnails for display are shared by every session.")
+upload_stats = get_upload_store().stats()
+files, disk, thumbnails, memory, swept = st.columns(5)
+files.metric("Files on disk", upload_stats["files"])
+disk.metric("Disk used", f"{upload_stats['disk_bytes'] / 1024 ** 2:.1f} MB")
+thumbnails.metric("Thumbnails", upload_stats["thumbnails"])
+memory.metric("Thumbnail memory", f"{upload_stats['memory_bytes'] / 1024 ** 2:.1f} MB")
+swept.metric("Swept", upload_stats["evicted"])
@@ -0,0 +1,90 @@
+import logging
+import re
+import string
+import textwrap
+from collections import namedtuple
+
+from response_cache import canonical_key
+
+logger = logging.getLogger(__name__)
+
+BLANK_LINES = re.compile(r"\n{3,}")
+INLINE_SPACE = re.compile(r"[ \t]+")
+
+RenderedPrompt = namedtuple("RenderedPrompt", ["text", "key", "template_id"])
+
+
+def normalise_whitespace(text):
+    """
+    Dedents `text`, trims trailing space on every line, collapses runs of
+    blank lines to one and strips leading/trailing blank lines. Indentation
+    relative to the least indented line (e.g. nested bullets) is kept.
+    """
+    lines = [line.rstrip() for line in textwrap.dedent(text).splitlines()]
+    return BLANK_LINES.sub("\n\n", "\n".join(lines)).strip("\n")
+
+
+def canonical_value(value):
+    """Normalises a template value so equivalent inputs render identically."""
+    if isinstance(value, str):
+        return "\n".join(INLINE_SPACE.sub(" ", line).strip() for line in value.strip().splitlines())
+    if isinstance(value, dict):
+        return {key: canonical_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(canonical_value(item) for item in value)
+    return value
+
+
+class PromptTemplate:
+    """
+    A user-prompt template in `str.format` syntax, whitespace-normalised and
+    parsed once. `render(**values)` returns the compact prompt text plus a
+    stable cache key derived from the template id and that canonical text.
+    """
+
+    def __init__(self, name, version, source):
+        self.name = name
+        self.version = version
+        self.id = f"{name}@v{version}"
+        self.source = source
+        self.text = normalise_whitespace(source)
+        self._formatter = string.Formatter()
+        self._parts = list(self._formatter.parse(self.text))
+        self.fields = tuple(dict.fromkeys(
+            re.split(r"[.\[]", field, maxsplit=1)[0] for _, field, _, _ in self._parts if field
+        ))
+
+    def render(self, **values):
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise ValueError(f"Prompt template {self.id} is missing values for: {', '.join(missing)}")
+        values = {name: canonical_value(value) for name, value in values.items()}
+        pieces = []
+        for literal, field, spec, conversion in self._parts:
+            pieces.append(literal)
+            if field is not None:
+                value, _ = self._formatter.get_field(field, (), values)
+                value = self._formatter.convert_field(value, conversion)
+                pieces.append(self._formatter.format_field(value, spec))
+        text = "".join(pieces)
+        return RenderedPrompt(text, canonical_key(self.id, text), self.id)
+
+    def __repr__(self):
+        return f"PromptTemplate({self.id!r}, fields={list(self.fields)})"
+
+
+PROMPT_TEMPLATES = {}
+
+
+def prompt_template(name, version, source):
+    """
+    Returns the compiled template for `name` at `version`, compiling it on
+    first use only; pages call this on every rerun. Bump `version` whenever
+    the wording changes so keys and telemetry tell the two apart.
+    """
+    template = PROMPT_TEMPLATES.get((name, version))
+    if template is None or template.source != source:
+        if template is not None:
+            logger.warning("Prompt template %s changed without a version bump.", template.id)
+        template = PROMPT_TEMPLATES[(name, version)] = PromptTemplate(name, version, source)
+    return template
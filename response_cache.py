@@ -0,0 +1,118 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import streamlit as st
+from retry import FallbackResponse
+
+# --- CACHE CONFIGURATION ---
+MAX_ENTRIES = 256
+TTL_SECONDS = 60 * 60
+STALE_NOTICE = ("> :material/cloud_off: The AI service is unavailable right now, so this is the last saved "
+                "answer for the same request. Please try again shortly for an up-to-date analysis.\n\n")
+
+
+def canonical_key(*parts):
+    """
+    Hashes structured inputs into a stable cache key. Dicts are serialised
+    with sorted keys, so widget order and insertion order do not matter.
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StaleText(str):
+    """An expired cached answer served while upstream is unavailable; never cached again."""
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache for deterministic model responses with single-flight
+    deduplication: concurrent callers asking for the same key share one
+    upstream call. Failed computations are not cached. Expired entries stay
+    in the LRU so `fallback(key)` can still serve them when upstream is down.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if now >= expires:
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns `(value, hit)`. On a miss `compute()` runs once per key even
+        when several sessions request it at the same moment; the others wait
+        for its result and count as hits.
+        """
+        with self._lock:
+            value = self._get(key, time.monotonic())
+            if value is not None:
+                return value, True
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result(), True
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            if value is not None and not isinstance(value, StaleText):
+                self.set(key, value)
+            return value, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def fallback(self, key):
+        """
+        A `call_with_retry` fallback for the call behind `key`: the last
+        answer cached for it, expired or not, marked as stale. Returns None,
+        so the upstream error is raised, when there is none.
+        """
+        def serve():
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return FallbackResponse(StaleText(STALE_NOTICE + entry[0]))
+        return serve
+
+
+@st.cache_resource
+def get_response_cache():
+    """Returns the process-wide analysis response cache."""
+    return ResponseCache()
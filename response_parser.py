@@ -0,0 +1,123 @@
+import re
+
+DELIMITER_PATTERN = re.compile(r"\[(START|END)_([A-Z_]+)\]")
+
+
+class ParsedResponse:
+    """
+    A model response split on its `[START_X]` / `[END_X]` delimiters.
+    `preamble` is the text before the first section, `trailing` any other
+    text outside a section, and `sections` maps names such as "FEEDING_PLAN"
+    to their content. Built once, then rendered by plain lookups.
+    """
+
+    __slots__ = ("text", "preamble", "sections", "trailing", "closed")
+
+    def __init__(self):
+        self.text = ""
+        self.preamble = ""
+        self.sections = {}
+        self.trailing = ""
+        self.closed = set()
+
+    def get(self, name, default=""):
+        return self.sections.get(name, default)
+
+    def is_complete(self, expected):
+        """True when every expected section was both opened and closed."""
+        return all(name in self.closed for name in expected)
+
+    def __repr__(self):
+        return f"ParsedResponse(sections={list(self.sections)}, complete={sorted(self.closed)})"
+
+
+def _could_be_delimiter(fragment):
+    """
+    Returns True if `fragment` (which starts with '[') may still grow into a
+    `[START_X]` / `[END_X]` delimiter once more chunks arrive.
+    """
+    for prefix in ("[START_", "[END_"):
+        if prefix.startswith(fragment):
+            return True
+        if fragment.startswith(prefix):
+            return re.fullmatch(r"[A-Z_]*", fragment[len(prefix):]) is not None
+    return False
+
+
+class SectionParser:
+    """
+    Single-pass, incremental delimiter parser. `feed` accepts chunks of any
+    size and returns `(section, text)` events as soon as they are known;
+    `section` is None for text outside any section. A delimiter split across
+    chunks is held back until complete. The events are also accumulated into
+    `self.result`, a ParsedResponse.
+    """
+
+    def __init__(self):
+        self.result = ParsedResponse()
+        self._section = None
+        self._seen_section = False
+        self._buffer = ""
+
+    def _emit(self, text):
+        result = self.result
+        if self._section is not None:
+            result.sections[self._section] = result.sections.get(self._section, "") + text
+        elif self._seen_section:
+            result.trailing += text
+        else:
+            result.preamble += text
+        return self._section, text
+
+    def feed(self, chunk):
+        self.result.text += chunk
+        self._buffer += chunk
+        events = []
+        while self._buffer:
+            bracket = self._buffer.find("[")
+            if bracket == -1:
+                events.append(self._emit(self._buffer))
+                self._buffer = ""
+                break
+            if bracket:
+                events.append(self._emit(self._buffer[:bracket]))
+                self._buffer = self._buffer[bracket:]
+            match = DELIMITER_PATTERN.match(self._buffer)
+            if match:
+                kind, name = match.groups()
+                if kind == "START":
+                    self._section = name
+                    self._seen_section = True
+                    self.result.sections.setdefault(name, "")
+                else:
+                    self.result.closed.add(name)
+                    self._section = None
+                self._buffer = self._buffer[match.end():]
+            elif _could_be_delimiter(self._buffer):
+                break
+            else:
+                events.append(self._emit("["))
+                self._buffer = self._buffer[1:]
+        return events
+
+    def close(self):
+        """Flushes any held-back text once the stream has ended."""
+        events = [self._emit(self._buffer)] if self._buffer else []
+        self._buffer = ""
+        return events
+
+
+def iter_sections(chunks, parser=None):
+    """Yields `(section, text)` events for a stream of text chunks."""
+    parser = parser or SectionParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def parse_response(text):
+    """Parses a complete response in one pass."""
+    parser = SectionParser()
+    parser.feed(text)
+    parser.close()
+    return parser.result
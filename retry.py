@@ -0,0 +1,243 @@
+import random
+import re
+import sys
+import threading
+import time
+
+import streamlit as st
+
+# --- RETRY CONFIGURATION ---
+MAX_ATTEMPTS = 4
+BASE_DELAY_SECONDS = 1.0
+MAX_DELAY_SECONDS = 8.0
+# Upper bound on the time a single request may spend waiting between attempts,
+# so a saturated upstream never holds a script thread for long.
+MAX_TOTAL_WAIT_SECONDS = 20.0
+REQUESTS_PER_MINUTE = 60
+BURST_SIZE = 10
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+
+RETRYABLE_ERROR_NAMES = (
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable",
+    "DeadlineExceeded", "InternalServerError", "BadGateway", "GatewayTimeout",
+)
+RETRY_HINT_PATTERNS = (
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry in\s*([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.IGNORECASE),
+)
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when a model call gives up: retries exhausted or circuit open."""
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class FallbackResponse:
+    """
+    What a `call_with_retry` fallback returns in place of a model response:
+    just the `text`, iterable as a single chunk for streamed callers.
+    """
+
+    usage_metadata = None
+
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        yield self
+
+
+def is_retryable(error):
+    """
+    Returns True for transient failures: rate limiting, overload, timeouts
+    and dropped connections. Bad requests and auth errors are not retried.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # Only look at google.api_core once something has imported it; an error
+    # of one of its types implies the module is already loaded.
+    api_exceptions = sys.modules.get("google.api_core.exceptions")
+    if api_exceptions is not None:
+        retryable = tuple(getattr(api_exceptions, name) for name in RETRYABLE_ERROR_NAMES)
+        return isinstance(error, retryable)
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def retry_after_seconds(error):
+    """
+    Extracts a server-provided retry hint from an API error, either from an
+    HTTP Retry-After header, a google.rpc.RetryInfo detail or the message.
+    Returns None when the error carries no hint.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    header = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    for detail in getattr(error, "details", None) or ():
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    message = str(error)
+    for pattern in RETRY_HINT_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt, base=BASE_DELAY_SECONDS, cap=MAX_DELAY_SECONDS):
+    """Exponential backoff with full jitter for the given 1-based attempt."""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `acquire` blocks until a token is free or the
+    timeout passes, and returns False if no token could be taken in time.
+    """
+
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and rejects
+    calls for `reset_seconds`. After that one trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+@st.cache_resource
+def get_rate_limiter():
+    """Returns the per-process token bucket shared by every session."""
+    return TokenBucket(REQUESTS_PER_MINUTE / 60.0, BURST_SIZE)
+
+
+@st.cache_resource
+def get_circuit_breaker():
+    """Returns the per-process circuit breaker shared by every session."""
+    return CircuitBreaker()
+
+
+def call_with_retry(fn, fallback=None, max_attempts=MAX_ATTEMPTS, max_total_wait=MAX_TOTAL_WAIT_SECONDS,
+                    limiter=None, breaker=None, on_retry=None):
+    """
+    Calls `fn()` under the shared rate limiter and circuit breaker, retrying
+    transient failures with jittered exponential backoff or the server's
+    retry hint. Non-transient errors are raised straight away.
+
+    When upstream is unavailable (circuit open, rate-limit wait too long or
+    retries exhausted) `fallback()` is returned if given, usually as a
+    FallbackResponse; if there is no fallback or it returns None,
+    UpstreamUnavailableError is raised. Background threads, which have no
+    Streamlit context, should pass the shared `limiter` and `breaker` in.
+    `on_retry(attempt, error, delay)` is called before each backoff sleep.
+    """
+    limiter = limiter or get_rate_limiter()
+    breaker = breaker or get_circuit_breaker()
+    deadline = time.monotonic() + max_total_wait
+
+    def give_up(error):
+        result = fallback() if fallback is not None else None
+        if result is None:
+            raise error
+        return result
+
+    for attempt in range(1, max_attempts + 1):
+        if not limiter.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            return give_up(UpstreamUnavailableError("Too many requests right now; please try again shortly."))
+        if not breaker.allow():
+            return give_up(CircuitOpenError("The AI service is overloaded; please try again shortly."))
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_retryable(e):
+                # Upstream answered, just not successfully; it is not saturated.
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            hint = retry_after_seconds(e)
+            delay = hint if hint is not None else backoff_delay(attempt)
+            if attempt == max_attempts or time.monotonic() + delay > deadline:
+                return give_up(UpstreamUnavailableError(f"The AI service did not respond after {attempt} attempt(s): {e}"))
+            if on_retry is not None:
+                on_retry(attempt, e, delay)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
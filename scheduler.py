@@ -0,0 +1,293 @@
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from retry import UpstreamUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# --- SCHEDULER CONFIGURATION ---
+# Model calls allowed upstream at once, across every session in the process.
+MAX_CONCURRENT_CALLS = 6
+# Longest a call waits for a slot before giving up.
+MAX_QUEUE_WAIT_SECONDS = 60.0
+# A waiting call moves up one priority level per AGING_SECONDS, so lower
+# priority work is delayed under load but never starved.
+AGING_SECONDS = 10.0
+# Slots held longer than this (e.g. a stream nobody read to the end) are reclaimed.
+MAX_HOLD_SECONDS = 300.0
+# Waiters re-check their place and refresh the queue notice this often.
+POLL_INTERVAL_SECONDS = 0.5
+# Sessions not served for this long are forgotten by the fairness tie-break.
+SESSION_MEMORY_SECONDS = 60.0
+# Starting guess for the slot hold time behind wait estimates.
+INITIAL_HOLD_SECONDS = 3.0
+WAIT_SAMPLES = 500
+# Lower goes first. Looked up by page, then by endpoint: interactive clinical
+# analyses ahead of chat replies, bulk triage, rolling summaries and translation.
+PRIORITIES = {"infection": 0, "umbilical": 1, "plan": 2, "follow_up": 2, "batch": 3, "summary": 3, "translate": 4}
+# Background endpoints, looked up before the page so bulk work on a clinical
+# page never queues ahead of that page's interactive calls.
+BACKGROUND_ENDPOINTS = ("batch", "summary", "translate")
+DEFAULT_PRIORITY = 2
+
+
+class QueueTimeoutError(UpstreamUnavailableError):
+    """Raised when a model call could not get a slot within its queue timeout."""
+
+
+def priority_for(page, endpoint):
+    if endpoint in BACKGROUND_ENDPOINTS:
+        return PRIORITIES[endpoint]
+    return PRIORITIES.get(page, PRIORITIES.get(endpoint, DEFAULT_PRIORITY))
+
+
+def current_session():
+    """Id of the Streamlit session running this thread, or None on worker threads."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+class Ticket:
+    """A queued or admitted model call. `release()` frees its slot; it is idempotent."""
+
+    __slots__ = ("scheduler", "priority", "session", "seq", "depth", "enqueued", "granted_at", "event")
+
+    def __init__(self, scheduler, priority, session, seq, depth, enqueued):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.session = session
+        self.seq = seq
+        self.depth = depth
+        self.enqueued = enqueued
+        self.granted_at = None
+        self.event = threading.Event()
+
+    def release(self):
+        self.scheduler.release(self)
+
+
+class ModelCallScheduler:
+    """
+    Process-wide admission control for model calls: at most `capacity` run
+    at once and the rest wait. Waiters are ranked by priority (aged by their
+    time in the queue), then by how many calls their session already has in
+    flight, then by how recently their session was served, then by arrival.
+    Callers run the call on their own thread while holding the slot, so
+    streamed replies keep it until fully read.
+    """
+
+    def __init__(self, capacity=MAX_CONCURRENT_CALLS, aging_seconds=AGING_SECONDS,
+                 max_hold_seconds=MAX_HOLD_SECONDS):
+        self.capacity = capacity
+        self.aging_seconds = aging_seconds
+        self.max_hold_seconds = max_hold_seconds
+        self.mean_hold_seconds = INITIAL_HOLD_SECONDS
+        self.admitted = 0
+        self.timed_out = 0
+        self.reclaimed = 0
+        self._waiting = []
+        self._held = set()
+        self._active = {}
+        self._last_served = {}
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _rank(self, ticket, now):
+        aged = ticket.priority - int((now - ticket.enqueued) // self.aging_seconds)
+        return aged, self._active.get(ticket.session, 0), self._last_served.get(ticket.session, 0.0), ticket.seq
+
+    def _dispatch(self, now):
+        for ticket in [t for t in self._held if now - t.granted_at > self.max_hold_seconds]:
+            logger.warning("Reclaiming a model call slot held for over %.0fs.", self.max_hold_seconds)
+            self._free(ticket, now)
+            self.reclaimed += 1
+        while self._waiting and len(self._held) < self.capacity:
+            ticket = min(self._waiting, key=lambda t: self._rank(t, now))
+            self._waiting.remove(ticket)
+            ticket.granted_at = now
+            self._held.add(ticket)
+            self._active[ticket.session] = self._active.get(ticket.session, 0) + 1
+            self._last_served[ticket.session] = now
+            self._waits.append(now - ticket.enqueued)
+            self.admitted += 1
+            ticket.event.set()
+
+    def _forget_idle_sessions(self, now):
+        for session, served in list(self._last_served.items()):
+            if now - served > SESSION_MEMORY_SECONDS and session not in self._active:
+                del self._last_served[session]
+
+    def _free(self, ticket, now):
+        self._held.discard(ticket)
+        remaining = self._active.get(ticket.session, 1) - 1
+        if remaining:
+            self._active[ticket.session] = remaining
+        else:
+            self._active.pop(ticket.session, None)
+        self.mean_hold_seconds = 0.8 * self.mean_hold_seconds + 0.2 * (now - ticket.granted_at)
+
+    def _position(self, ticket, now):
+        rank = self._rank(ticket, now)
+        return sum(1 for t in self._waiting if self._rank(t, now) < rank)
+
+    def estimated_wait(self, position):
+        """Seconds until the call with `position` calls ahead of it is admitted, at the current pace."""
+        return (position + 1) * self.mean_hold_seconds / self.capacity
+
+    def acquire(self, priority, session=None, timeout=MAX_QUEUE_WAIT_SECONDS, on_wait=None):
+        """
+        Blocks until the call is admitted and returns its Ticket. While it
+        waits, `on_wait(position, estimated_seconds)` is called about every
+        POLL_INTERVAL_SECONDS on the waiting thread. Raises QueueTimeoutError
+        after `timeout` seconds in the queue. If the wait is interrupted (e.g.
+        Streamlit stopping the script inside `on_wait`), the ticket leaves
+        the queue, or gives its slot back if it was just granted one.
+        """
+        now = time.monotonic()
+        deadline = now + timeout
+        with self._lock:
+            ticket = Ticket(self, priority, session, next(self._seq), len(self._waiting), now)
+            self._waiting.append(ticket)
+            self._dispatch(now)
+        try:
+            while not ticket.event.wait(POLL_INTERVAL_SECONDS):
+                now = time.monotonic()
+                with self._lock:
+                    self._dispatch(now)
+                    if ticket.granted_at is not None:
+                        break
+                    if now >= deadline:
+                        self._waiting.remove(ticket)
+                        self.timed_out += 1
+                        raise QueueTimeoutError("The AI service is busy; please try again shortly.")
+                    position = self._position(ticket, now)
+                if on_wait is not None:
+                    on_wait(position, self.estimated_wait(position))
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        return ticket
+
+    def _abandon(self, ticket):
+        with self._lock:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                return
+        self.release(ticket)
+
+    def release(self, ticket):
+        with self._lock:
+            if ticket not in self._held:
+                return
+            now = time.monotonic()
+            self._free(ticket, now)
+            self._dispatch(now)
+            self._forget_idle_sessions(now)
+
+    def stats(self, percentiles=(0.5, 0.95, 0.99)):
+        """Current queue depth (overall and per priority), slots in use and wait-time percentiles."""
+        with self._lock:
+            waits = sorted(self._waits)
+            depth = {}
+            for ticket in self._waiting:
+                depth[ticket.priority] = depth.get(ticket.priority, 0) + 1
+            stats = {
+                "in_flight": len(self._held), "capacity": self.capacity, "queue_depth": len(self._waiting),
+                "depth_by_priority": dict(sorted(depth.items())), "sessions_in_flight": len(self._active),
+                "mean_hold_s": self.mean_hold_seconds, "admitted": self.admitted,
+                "timed_out": self.timed_out, "reclaimed": self.reclaimed,
+            }
+        for q in percentiles:
+            stats[f"wait_p{round(q * 100)}_s"] = waits[min(len(waits) - 1, int(q * len(waits)))] if waits else None
+        return stats
+
+
+@st.cache_resource
+def get_scheduler():
+    """Process-wide model call scheduler shared by every session."""
+    return ModelCallScheduler()
+
+
+class QueueBoard:
+    """
+    Queue positions of calls waiting on worker threads, for the script
+    thread to show: `reporter(name)` is the `on_wait` for one task, and the
+    script thread reads `waiting()` while it polls for results.
+    """
+
+    def __init__(self):
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+    def reporter(self, name):
+        return QueueReporter(self, name)
+
+    def update(self, name, position, estimated_seconds):
+        with self._lock:
+            self._waiting[name] = (position, estimated_seconds)
+
+    def clear(self, name):
+        with self._lock:
+            self._waiting.pop(name, None)
+
+    def waiting(self):
+        """A name -> (position, estimated_seconds) snapshot of the calls still queued."""
+        with self._lock:
+            return dict(self._waiting)
+
+
+class QueueReporter:
+    """`on_wait` callback for a worker thread: posts its place in the queue to a QueueBoard until `close()`."""
+
+    __slots__ = ("board", "name")
+
+    def __init__(self, board, name):
+        self.board = board
+        self.name = name
+
+    def __call__(self, position, estimated_seconds):
+        self.board.update(self.name, position, estimated_seconds)
+
+    def close(self):
+        self.board.clear(self.name)
+
+
+class QueueNotice:
+    """
+    Shows the queue position and estimated wait in a placeholder (a new
+    `st.empty()` unless one is given) until `close()`. Call it as the
+    `on_wait` of a call made on the script thread, or hand `show_waiting()`
+    a QueueBoard snapshot for calls made on worker threads.
+    """
+
+    def __init__(self, placeholder=None):
+        self._placeholder = placeholder
+
+    def _show(self, text):
+        if self._placeholder is None:
+            self._placeholder = st.empty()
+        self._placeholder.info(text, icon=":material/hourglass_top:")
+
+    def __call__(self, position, estimated_seconds):
+        ahead = "You're next" if position == 0 else f"{position} request(s) ahead of you"
+        self._show(f"The AI service is busy. {ahead}; estimated wait about {max(1, round(estimated_seconds))}s.")
+
+    def show_waiting(self, waiting):
+        if not waiting:
+            self.close()
+            return
+        position = min(p for p, _ in waiting.values())
+        estimated_seconds = max(s for _, s in waiting.values())
+        ahead = "the first is next" if position == 0 else f"the first has {position} request(s) ahead of it"
+        self._show(f"The AI service is busy. {len(waiting)} of these requests are queued and {ahead}; "
+                   f"all should start within about {max(1, round(estimated_seconds))}s.")
+
+    def close(self):
+        if self._placeholder is not None:
+            self._placeholder.empty()
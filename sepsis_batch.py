@@ -0,0 +1,185 @@
+import re
+
+from lazy_imports import lazy_import
+from response_cache import canonical_key
+from sepsis_score import score_frame
+
+# numpy and pandas load on first use so the Infection page renders without them.
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# --- BATCH CONFIGURATION ---
+# Patients packed into one model request; keeps prompts small enough that
+# one slow or failed request only delays a handful of rows.
+PATIENTS_PER_REQUEST = 8
+MAX_BATCH_ROWS = 2000
+# Counted from when a request starts running, not from when the batch was submitted.
+BATCH_TASK_TIMEOUT_SECONDS = 120
+# Requests of one batch on the shared fan-out pool at once, leaving the
+# other workers to interactive analyses.
+BATCH_MAX_IN_FLIGHT = 4
+ID_COLUMN = "patient_id"
+
+# Same fields and ranges as the Clinical and Lab tabs.
+NUMERIC_RANGES = {
+    'age': (0, 90), 'birth_weight': (0.5, 10.0), 'current_weight': (0.5, 10.0),
+    'gestational_age': (22, 45), 'temperature': (34.0, 42.0), 'heart_rate': (50, 250),
+    'resp_rate': (10, 100), 'cap_refill': (1, 10), 'urine_output': (0.0, 10.0),
+    'spo2': (70, 100), 'bp_systolic': (0, 150), 'bp_diastolic': (0, 100),
+    'ph': (6.8, 7.8), 'lactate': (0.0, 20.0), 'crp': (0, 300), 'wbc': (0, 50),
+    'platelets': (0, 600), 'procalcitonin': (0.0, 100.0), 'glucose': (0, 500),
+}
+CATEGORY_VALUES = {
+    'feeding_status': ("Exclusive Breastfeeding", "Mixed Feeding", "Formula-fed"),
+    'skin_perfusion': ("Normal", "Pale", "Mottled", "Cyanotic"),
+    'blood_culture': ("Not Available", "Pending", "No Growth", "Growth Detected"),
+}
+BOOLEAN_VALUES = {'lethargy': {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}}
+OPTIONAL_FIELDS = {'bp_systolic', 'bp_diastolic', 'procalcitonin'}
+FIELDS = list(NUMERIC_RANGES) + list(CATEGORY_VALUES) + list(BOOLEAN_VALUES)
+
+BATCH_INSTRUCTION = """
+You are an expert medical AI assistant specializing in neonatology, triaging a ward of neonates for sepsis and septic shock.
+Each patient is given on one line as `Patient <id>: <findings>`. Use established clinical reasoning patterns (like those informing nSOFA scores).
+
+**Mandatory Output Format:**
+For every patient, reply with exactly one line and nothing else:
+[PATIENT <id>] <High Risk|Moderate Risk|Low Risk> | <one-sentence rationale naming the key abnormal findings>
+"""
+ANSWER_PATTERN = re.compile(r"^\[PATIENT ([^\]]+)\]\s*(High|Moderate|Low) Risk\s*\|\s*(.*)$", re.MULTILINE)
+RISK_ORDER = {"High Risk": 0, "Moderate Risk": 1, "Low Risk": 2}
+
+
+def read_records(uploaded_file):
+    """Reads a CSV or Parquet upload into a DataFrame (Parquet needs pyarrow)."""
+    if uploaded_file.name.lower().endswith(".parquet"):
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file)
+
+
+def validate_records(frame):
+    """
+    Checks every row against the tab fields in one vectorised pass per
+    column. Returns `(records, problems)`: the valid rows with normalised
+    types and a `patient_id` column, and a row/field/problem table for the
+    rows that were left out.
+    """
+    frame = frame.head(MAX_BATCH_ROWS)
+    if ID_COLUMN in frame:
+        ids = frame[ID_COLUMN].astype(str).str.strip()
+    else:
+        ids = pd.Series([f"P{n}" for n in range(1, len(frame) + 1)], index=frame.index)
+    records = pd.DataFrame({ID_COLUMN: ids}, index=frame.index)
+    problems = []
+
+    def report(mask, field, problem):
+        rows = np.flatnonzero(mask)
+        if len(rows):
+            problems.append(pd.DataFrame({ID_COLUMN: ids.iloc[rows].to_numpy(), 'field': field, 'problem': problem}))
+
+    report(ids.duplicated(keep=False), ID_COLUMN, "duplicate patient id")
+    for field in FIELDS:
+        if field not in frame:
+            if field in OPTIONAL_FIELDS:
+                records[field] = np.nan
+            else:
+                report(np.ones(len(frame), dtype=bool), field, "missing column")
+            continue
+        column = frame[field]
+        if field in NUMERIC_RANGES:
+            low, high = NUMERIC_RANGES[field]
+            values = pd.to_numeric(column, errors="coerce")
+            missing = values.isna() & (column.notna() | (field not in OPTIONAL_FIELDS))
+            report(missing, field, "missing or not a number")
+            report((values < low) | (values > high), field, f"outside {low}-{high}")
+        elif field in CATEGORY_VALUES:
+            values = column.astype(str).str.strip()
+            report(~values.isin(CATEGORY_VALUES[field]), field, "expected one of " + ", ".join(CATEGORY_VALUES[field]))
+        else:
+            values = column.astype(str).str.strip().str.lower().map(BOOLEAN_VALUES[field])
+            report(values.isna(), field, "expected yes/no")
+        records[field] = values
+
+    problems = pd.concat(problems, ignore_index=True) if problems else pd.DataFrame(columns=[ID_COLUMN, 'field', 'problem'])
+    valid = ~ids.isin(problems[ID_COLUMN])
+    return records[valid].reset_index(drop=True), problems
+
+
+def format_patients(records):
+    """One compact line per patient, built column-wise."""
+    def fmt(field, template):
+        return records[field].map(lambda value: "n/a" if pd.isna(value) else template.format(value))
+
+    lines = (
+        "Patient " + records[ID_COLUMN] + ": age " + fmt('age', "{:g} d") + ", GA " + fmt('gestational_age', "{:g} wk")
+        + ", weight " + fmt('birth_weight', "{:g}") + "->" + fmt('current_weight', "{:g} kg")
+        + ", " + records['feeding_status'] + ", T " + fmt('temperature', "{:g} °C") + ", HR " + fmt('heart_rate', "{:g}")
+        + ", RR " + fmt('resp_rate', "{:g}") + ", CRT " + fmt('cap_refill', "{:g} s") + ", perfusion " + records['skin_perfusion']
+        + ", lethargy " + records['lethargy'].map({True: "yes", False: "no"}) + ", UO " + fmt('urine_output', "{:g} ml/kg/hr")
+        + ", SpO2 " + fmt('spo2', "{:g}%") + ", BP " + fmt('bp_systolic', "{:g}") + "/" + fmt('bp_diastolic', "{:g}")
+        + ", pH " + fmt('ph', "{:g}") + ", lactate " + fmt('lactate', "{:g}") + ", CRP " + fmt('crp', "{:g}")
+        + ", WBC " + fmt('wbc', "{:g}") + ", platelets " + fmt('platelets', "{:g}") + ", culture " + records['blood_culture']
+        + ", PCT " + fmt('procalcitonin', "{:g}") + ", glucose " + fmt('glucose', "{:g}")
+    )
+    return lines.tolist()
+
+
+def parse_answers(text):
+    """Maps patient id -> (risk tier, rationale) for each well-formed answer line."""
+    return {pid.strip(): (f"{risk} Risk", rationale.strip()) for pid, risk, rationale in ANSWER_PATTERN.findall(text)}
+
+
+def build_batch_tasks(records, model, model_id, cache, limiter, breaker, telemetry, size=PATIENTS_PER_REQUEST,
+                      tier=None, session=None, queue=None):
+    """
+    Packs the records into requests of `size` patients. Returns a name ->
+    callable dict for `fanout.run_parallel` (run it with BATCH_MAX_IN_FLIGHT
+    and BATCH_TASK_TIMEOUT_SECONDS); each callable returns the parsed
+    answers for its patients, is cached on its own prompt and is recorded
+    as one `telemetry` span tagged with the model `tier` and scheduled on
+    behalf of `session`. Requests waiting for a model call slot post their
+    place to the `queue` board, if given.
+    """
+    tasks = {}
+    for start in range(0, len(records), size):
+        prompt = "\n".join(format_patients(records.iloc[start:start + size]))
+        cache_key = canonical_key(model_id, BATCH_INSTRUCTION, prompt)
+        name = f"rows {start + 1}-{min(start + size, len(records))}"
+        on_wait = queue.reporter(name) if queue is not None else None
+
+        def task(prompt=prompt, cache_key=cache_key, on_wait=on_wait):
+            with telemetry.span("infection", "batch", model=model_id, tier=tier, session=session,
+                                on_wait=on_wait) as span:
+                def generate():
+                    return span.call(lambda: model.generate_content(prompt), limiter=limiter, breaker=breaker,
+                                     fallback=cache.fallback(cache_key)).text
+                text, hit = cache.get_or_compute(cache_key, generate)
+                span.cache_hit(hit)
+            return parse_answers(text)
+
+        tasks[name] = task
+    return tasks
+
+
+def rank_patients(records, answers=None, pending="Pending"):
+    """
+    Builds the ranked triage table: the local pre-screen for every patient,
+    plus the model's tier and rationale where `answers` has them. Rows are
+    ordered by model tier, then pre-screen total and flag count.
+    """
+    answers = answers or {}
+    scores = score_frame(records)
+    ai = records[ID_COLUMN].map(lambda pid: answers.get(pid, (pending, "")))
+    table = pd.DataFrame({
+        ID_COLUMN: records[ID_COLUMN],
+        'ai_risk': ai.str[0],
+        'prescreen_risk': scores['risk'],
+        'prescreen_total': scores['score_total'],
+        'flags': scores['flag_count'],
+        'rationale': ai.str[1],
+    })
+    order = table['ai_risk'].map(RISK_ORDER).fillna(len(RISK_ORDER))
+    prescreen_order = table['prescreen_risk'].map(RISK_ORDER)
+    return (table.assign(_order=order, _prescreen=prescreen_order)
+            .sort_values(['_order', '_prescreen', 'prescreen_total', 'flags'], ascending=[True, True, False, False])
+            .drop(columns=['_order', '_prescreen']).reset_index(drop=True))
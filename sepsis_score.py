@@ -0,0 +1,172 @@
+from lazy_imports import lazy_import
+
+# numpy and pandas load on first use so the Infection page renders without them.
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# --- SCORING THRESHOLDS ---
+# Local, rule-based pre-screen over the Infection page's clinical and lab
+# fields. It is a triage aid shown before (or instead of) the model call,
+# not a validated nSOFA.
+# nSOFA-style organ sub-scores, 0-3 each. Without FiO2 or inotrope data the
+# respiratory and cardiovascular scores use SpO2 on room air and perfusion
+# markers (capillary refill, mottling, lactate) as proxies.
+PLATELET_CUTOFFS = (150, 100, 50)        # x10^9/L: <150 -> 1, <100 -> 2, <50 -> 3
+SPO2_CUTOFFS = (95, 90, 85)              # %: <95 -> 1, <90 -> 2, <85 -> 3
+LACTATE_CUTOFFS = (2.0, 4.0)             # mmol/L
+PH_CUTOFFS = (7.25, 7.15)
+URINE_OUTPUT_CUTOFFS = (1.0, 0.5)        # ml/kg/hr
+POOR_PERFUSION = ("Mottled", "Cyanotic")
+# Lethargy arrives as a checkbox bool, a parsed yes/no or raw CSV text.
+LETHARGY_VALUES = {"true", "yes", "1", "1.0"}
+
+# Threshold flags: name -> (label, column, predicate). NaN never raises a flag.
+FLAGS = {
+    "fever": ("Temperature ≥ 38.0 °C", "temperature", lambda v: v >= 38.0),
+    "hypothermia": ("Temperature < 36.0 °C", "temperature", lambda v: v < 36.0),
+    "tachycardia": ("Heart rate > 180 bpm", "heart_rate", lambda v: v > 180),
+    "bradycardia": ("Heart rate < 100 bpm", "heart_rate", lambda v: v < 100),
+    "tachypnea": ("Respiratory rate > 60/min", "resp_rate", lambda v: v > 60),
+    "slow_cap_refill": ("Capillary refill > 3 s", "cap_refill", lambda v: v > 3),
+    "hypoxemia": ("SpO2 < 92 %", "spo2", lambda v: v < 92),
+    "oliguria": ("Urine output < 1 ml/kg/hr", "urine_output", lambda v: v < 1.0),
+    "hyperlactatemia": ("Lactate > 2 mmol/L", "lactate", lambda v: v > 2.0),
+    "acidosis": ("pH < 7.25", "ph", lambda v: v < 7.25),
+    "raised_crp": ("CRP ≥ 10 mg/L", "crp", lambda v: v >= 10),
+    "raised_pct": ("Procalcitonin ≥ 2 ng/mL", "procalcitonin", lambda v: v >= 2.0),
+    "leukopenia": ("WBC < 5 x10^9/L", "wbc", lambda v: v < 5),
+    "leukocytosis": ("WBC > 30 x10^9/L", "wbc", lambda v: v > 30),
+    "thrombocytopenia": ("Platelets < 150 x10^9/L", "platelets", lambda v: v < 150),
+    "hypoglycemia": ("Glucose < 45 mg/dL", "glucose", lambda v: v < 45),
+    "hyperglycemia": ("Glucose > 180 mg/dL", "glucose", lambda v: v > 180),
+}
+
+FLAG_LABELS = {name: label for name, (label, _, _) in FLAGS.items()}
+FLAG_LABELS.update(lethargy="Lethargy or irritability", culture_positive="Blood culture growth detected")
+
+SUBSCORES = ("respiratory", "cardiovascular", "hematologic", "metabolic", "renal")
+NUMERIC_FIELDS = sorted({column for _, column, _ in FLAGS.values()} | {"bp_systolic"})
+CATEGORICAL_FIELDS = ("skin_perfusion", "blood_culture", "lethargy")
+
+# Risk tiers, checked in order: (tier, minimum total score, minimum flag count).
+RISK_TIERS = (("High Risk", 5, 6), ("Moderate Risk", 2, 3))
+LOW_RISK = "Low Risk"
+
+
+def _numeric(columns, name, size):
+    if name not in columns:
+        return np.full(size, np.nan)
+    values = np.atleast_1d(columns[name])
+    try:
+        return values.astype(float)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+
+
+def _categorical(columns, name, size):
+    if name not in columns:
+        return np.full(size, "", dtype=object)
+    return np.atleast_1d(np.asarray(columns[name], dtype=object))
+
+
+def _banded(values, cutoffs):
+    """0 at or above the first cutoff, +1 for each cutoff the value falls below."""
+    with np.errstate(invalid="ignore"):
+        return sum((values < cutoff).astype(int) for cutoff in cutoffs)
+
+
+def score_columns(columns):
+    """
+    Scores column-oriented data: a mapping of field name to a scalar or an
+    array of values (one entry per patient). Missing fields and unparsable
+    values count as normal. Returns a dict of numpy arrays: "score_<organ>"
+    per sub-score, "flag_<name>" per flag, "score_total", "flag_count" and
+    "risk".
+    """
+    size = max((np.size(value) for value in columns.values()), default=1)
+    values = {name: _numeric(columns, name, size) for name in NUMERIC_FIELDS}
+    skin = _categorical(columns, "skin_perfusion", size)
+    culture = _categorical(columns, "blood_culture", size)
+    lethargy = _categorical(columns, "lethargy", size)
+
+    with np.errstate(invalid="ignore"):
+        scores = {
+            "respiratory": _banded(values["spo2"], SPO2_CUTOFFS),
+            "cardiovascular": np.minimum(
+                (values["cap_refill"] > 3).astype(int)
+                + np.isin(skin, POOR_PERFUSION).astype(int)
+                + sum((values["lactate"] >= cutoff).astype(int) for cutoff in LACTATE_CUTOFFS),
+                3,
+            ),
+            "hematologic": _banded(values["platelets"], PLATELET_CUTOFFS),
+            "metabolic": np.minimum(
+                _banded(values["ph"], PH_CUTOFFS)
+                + ((values["glucose"] < 45) | (values["glucose"] > 180)).astype(int),
+                3,
+            ),
+            "renal": _banded(values["urine_output"], URINE_OUTPUT_CUTOFFS),
+        }
+        flags = {name: predicate(values[column]) for name, (_, column, predicate) in FLAGS.items()}
+    # Compared as text: np.isin would coerce the candidates to strings and miss a real bool True.
+    flags["lethargy"] = pd.Series(lethargy).astype(str).str.strip().str.lower().isin(LETHARGY_VALUES).to_numpy()
+    flags["culture_positive"] = culture == "Growth Detected"
+
+    result = {f"score_{name}": scores[name] for name in SUBSCORES}
+    result.update((f"flag_{name}", flag) for name, flag in flags.items())
+    result["score_total"] = sum(scores.values())
+    result["flag_count"] = sum(flag.astype(int) for flag in flags.values())
+
+    risk = np.full(size, LOW_RISK, dtype=object)
+    # Later (lower) tiers are applied first so higher tiers overwrite them.
+    for tier, min_total, min_flags in reversed(RISK_TIERS):
+        risk[(result["score_total"] >= min_total) | (result["flag_count"] >= min_flags)] = tier
+    risk[flags["culture_positive"]] = RISK_TIERS[0][0]
+    result["risk"] = risk
+    return result
+
+
+def score_patient(clinical, lab):
+    """
+    Scores one patient from the page's `clinical_data` and `lab_data` dicts.
+    Returns a dict with the sub-scores, the total, the risk tier and the
+    labels of the raised flags.
+    """
+    result = score_columns({**clinical, **lab})
+    return {
+        "subscores": {name: int(result[f"score_{name}"][0]) for name in SUBSCORES},
+        "total": int(result["score_total"][0]),
+        "risk": result["risk"][0],
+        "flags": [label for name, label in FLAG_LABELS.items() if result[f"flag_{name}"][0]],
+    }
+
+
+def score_frame(frame):
+    """Scores a DataFrame with one patient per row; returns the scores as a DataFrame."""
+    columns = {name: frame[name].to_numpy() for name in frame.columns}
+    return pd.DataFrame(score_columns(columns) if len(frame) else {}, index=frame.index)
+
+
+def score_csv(source, **read_csv_kwargs):
+    """Reads patient records from a CSV path or buffer and returns them with their scores."""
+    frame = pd.read_csv(source, **read_csv_kwargs)
+    return frame.join(score_frame(frame))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description="Score patient records from a CSV for audit.")
+    parser.add_argument("source", help="CSV with clinical_data / lab_data columns, one patient per row")
+    parser.add_argument("-o", "--output", help="write the scored records to this CSV instead of stdout")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scored = score_csv(args.source)
+    elapsed = time.perf_counter() - start
+    if args.output:
+        scored.to_csv(args.output, index=False)
+    else:
+        print(scored.to_csv(index=False), end="")
+    print(f"Scored {len(scored)} records in {elapsed * 1000:.1f} ms", file=sys.stderr)
@@ -0,0 +1,74 @@
+import streamlit as st
+
+
+class ChatMessage:
+    """
+    Compact chat message: role, original text and the language it was
+    written in, and per-language caches of the translated text and of its
+    parsed ParsedResponse sections.
+    """
+
+    __slots__ = ("role", "text", "language", "translations", "sections")
+
+    def __init__(self, role, text, translations=None, sections=None, language="English"):
+        self.role = role
+        self.text = text
+        self.language = language
+        self.translations = translations if translations is not None else {}
+        self.sections = sections if sections is not None else {}
+
+    def __repr__(self):
+        return f"ChatMessage(role={self.role!r}, text={self.text[:40]!r}...)"
+
+
+class PageState:
+    """
+    Namespaced view over `st.session_state` for one page, so pages that use
+    the same names (messages, language, age, ...) no longer share values.
+    Supports the same attribute / item / `in` access as `st.session_state`;
+    use `key(name)` for widget keys.
+    """
+
+    def __init__(self, namespace):
+        object.__setattr__(self, "namespace", namespace)
+
+    def key(self, name):
+        return f"{self.namespace}.{name}"
+
+    def __contains__(self, name):
+        return self.key(name) in st.session_state
+
+    def __getitem__(self, name):
+        return st.session_state[self.key(name)]
+
+    def __setitem__(self, name, value):
+        st.session_state[self.key(name)] = value
+
+    def __delitem__(self, name):
+        del st.session_state[self.key(name)]
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(f"'{self.namespace}' page state has no attribute '{name}'") from None
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def get(self, name, default=None):
+        return st.session_state.get(self.key(name), default)
+
+    def setdefault(self, name, default):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def pop(self, name, default=None):
+        return st.session_state.pop(self.key(name), default)
+
+
+def page_state(namespace):
+    """Returns the session-state namespace for the page called `namespace`."""
+    return PageState(namespace)
+
@@ -0,0 +1,54 @@
+import streamlit as st
+from response_parser import SectionParser, iter_sections
+
+
+def write_sectioned_stream(chunks, containers, leading, trailing):
+    """
+    Streams a delimited response into a prepared layout with `st.write_stream`.
+    Each section is written into `containers[section]` as soon as its first
+    chunk arrives; text before the first section goes to `leading` and any
+    other undelimited text to `trailing`. Returns the ParsedResponse built
+    while streaming, so the reply never needs to be parsed again.
+    """
+    parser = SectionParser()
+    events = iter_sections(chunks, parser)
+    pending = next(events, None)
+    seen_section = False
+
+    while pending is not None:
+        section, text = pending
+        if section is not None:
+            seen_section = True
+            target = containers.get(section, trailing)
+        else:
+            target = trailing if seen_section else leading
+
+        def run(first_text=text, current=section):
+            nonlocal pending
+            yield first_text
+            for next_section, next_text in events:
+                if next_section != current:
+                    pending = (next_section, next_text)
+                    return
+                yield next_text
+            pending = None
+
+        segment = run()
+        # Skip whitespace-only runs so gaps between delimiters don't create
+        # empty markdown blocks.
+        head = ""
+        for piece in segment:
+            head += piece
+            if head.strip():
+                break
+        else:
+            continue
+        with target:
+            st.write_stream(_prepend(head, segment))
+
+    return parser.result
+
+
+def _prepend(head, rest):
+    yield head
+    yield from rest
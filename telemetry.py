@@ -0,0 +1,305 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import streamlit as st
+from lazy_imports import lazy_import
+from retry import call_with_retry
+from scheduler import QueueNotice, current_session, get_scheduler, priority_for
+
+# Only the admin page aggregates spans; recording them needs no pandas.
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+# --- TELEMETRY CONFIGURATION ---
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+TELEMETRY_PATH = os.path.join(CACHE_DIR, "telemetry", "model_calls.jsonl")
+# The live file is rotated to .1, .2, ... once it reaches MAX_FILE_BYTES.
+MAX_FILE_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+PERCENTILES = (0.5, 0.95, 0.99)
+SPAN_FIELDS = ("page", "endpoint", "model", "tier", "fallback", "started_at", "wall_ms", "ttft_ms", "prompt_tokens",
+               "cached_tokens", "response_tokens", "image_bytes", "cache", "retries", "error", "stream",
+               "queue_ms", "queue_depth")
+
+
+def image_bytes(contents):
+    """Total size of the inline image parts (`{"mime_type", "data"}`) in a payload."""
+    if isinstance(contents, dict):
+        data = contents.get("data")
+        if isinstance(data, (bytes, bytearray)):
+            return len(data)
+        return sum(image_bytes(part) for part in contents.get("parts", ()))
+    if isinstance(contents, (list, tuple)):
+        return sum(image_bytes(item) for item in contents)
+    return 0
+
+
+class JsonlSink:
+    """
+    Appends one JSON object per line to `path`, rotating the file once it
+    grows past `max_bytes` and keeping `backup_count` older files. Writes
+    are serialised, so spans from worker threads can share one sink.
+    Without a writable disk writes are dropped and nothing is read back.
+    """
+
+    def __init__(self, path=TELEMETRY_PATH, max_bytes=MAX_FILE_BYTES, backup_count=BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        self.persistent = True
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        except OSError as e:
+            # A read-only disk should only cost us telemetry.
+            logger.warning("Telemetry disabled; could not create %s: %s", os.path.dirname(path), e)
+            self.persistent = False
+
+    def files(self):
+        """Existing files, oldest first."""
+        candidates = [f"{self.path}.{n}" for n in range(self.backup_count, 0, -1)] + [self.path]
+        return [path for path in candidates if os.path.exists(path)]
+
+    def _rotate(self):
+        for n in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, record):
+        if not self.persistent:
+            return
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                # Telemetry must never break a model call.
+                logger.warning("Could not write telemetry: %s", e)
+
+    def read(self, since=None):
+        """Returns every stored record (optionally only those started at or after `since`)."""
+        records = []
+        if not self.persistent:
+            return records
+        with self._lock:
+            for path in self.files():
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        for line in f:
+                            try:
+                                record = json.loads(line)
+                            except ValueError:
+                                continue
+                            if since is None or record.get("started_at", 0) >= since:
+                                records.append(record)
+                except OSError as e:
+                    logger.warning("Could not read telemetry from %s: %s", path, e)
+        return records
+
+
+class Span:
+    """
+    Telemetry for one logical model request, from cache lookup to the last
+    streamed chunk. Use as a context manager and run the upstream call with
+    `call()`; it counts retries, reads token usage from the response's
+    `usage_metadata` and measures time to first token. A streamed call hands
+    back a wrapped stream and the span is written once that is exhausted.
+    With a `scheduler`, the call first waits for a slot, which is held
+    until the response (or stream) is done. `on_wait` reports the queue
+    position while it waits (see scheduler.QueueNotice and QueueReporter);
+    by default it is only shown for calls made on a script thread.
+    """
+
+    def __init__(self, sink, page, endpoint, model=None, contents=None, tier=None, fallback=False,
+                 scheduler=None, session=None, on_wait=None):
+        self.sink = sink
+        self.scheduler = scheduler
+        self.session = session
+        self.on_wait = on_wait
+        self._ticket = None
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._finished = False
+        self._streaming = False
+        self.record = dict.fromkeys(SPAN_FIELDS)
+        self.record.update(page=page, endpoint=endpoint, model=model, tier=tier, fallback=fallback,
+                           started_at=round(self.started_at, 3),
+                           image_bytes=image_bytes(contents), retries=0, stream=False)
+
+    def _elapsed_ms(self):
+        return round((time.perf_counter() - self._start) * 1000, 1)
+
+    def cache_hit(self, hit):
+        self.record["cache"] = "hit" if hit else "miss"
+
+    def _count_retry(self, attempt, error, delay):
+        self.record["retries"] += 1
+
+    def _observe_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        cached_tokens = getattr(usage, "cached_content_token_count", None)
+        response_tokens = getattr(usage, "candidates_token_count", None)
+        if prompt_tokens:
+            self.record["prompt_tokens"] = prompt_tokens
+        if cached_tokens:
+            self.record["cached_tokens"] = cached_tokens
+        if response_tokens:
+            self.record["response_tokens"] = response_tokens
+
+    def fail(self, error):
+        if self.record["error"] is None:
+            self.record["error"] = f"{type(error).__name__}: {error}"[:300]
+
+    def call(self, fn, stream=False, **retry_options):
+        """
+        Runs `fn()` through `call_with_retry`. Returns the response, or for
+        `stream=True` an iterator over its chunks that closes the span.
+        """
+        try:
+            self._admit()
+            response = call_with_retry(fn, on_retry=self._count_retry, **retry_options)
+        except Exception as e:
+            self.fail(e)
+            self._release()
+            raise
+        if stream:
+            self.record["stream"] = True
+            self._streaming = True
+            return self._stream(response)
+        self._release()
+        self.record["ttft_ms"] = self._elapsed_ms()
+        self._observe_usage(response)
+        return response
+
+    def _admit(self):
+        if self.scheduler is None or self._ticket is not None:
+            return
+        notice = self.on_wait
+        if notice is None and current_session() is not None:
+            notice = QueueNotice()
+        start = time.perf_counter()
+        try:
+            self._ticket = self.scheduler.acquire(priority_for(self.record["page"], self.record["endpoint"]),
+                                                  self.session, on_wait=notice)
+            self.record["queue_depth"] = self._ticket.depth
+        finally:
+            self.record["queue_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            if notice is not None:
+                notice.close()
+
+    def _release(self):
+        if self._ticket is not None:
+            self._ticket.release()
+
+    def _stream(self, response):
+        try:
+            for chunk in response:
+                if self.record["ttft_ms"] is None:
+                    self.record["ttft_ms"] = self._elapsed_ms()
+                yield chunk
+            # Streamed responses carry the final usage once fully consumed.
+            self._observe_usage(response)
+        except Exception as e:
+            self.fail(e)
+            raise
+        finally:
+            self.finish()
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        self._release()
+        self.record["wall_ms"] = self._elapsed_ms()
+        self.sink.write(self.record)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.fail(exc)
+        # A handed-out stream finishes the span itself, unless it never started.
+        if not self._streaming or exc is not None:
+            self.finish()
+        return False
+
+
+class Telemetry:
+    """
+    Creates spans that write to a shared sink and, given a `scheduler`,
+    admit their calls through it. Spans created on a worker thread should
+    be given the `session` they run for, and an `on_wait` reporter if the
+    script thread is to show their place in the queue.
+    """
+
+    def __init__(self, sink=None, scheduler=None):
+        self.sink = sink or JsonlSink()
+        self.scheduler = scheduler
+
+    def span(self, page, endpoint, model=None, contents=None, tier=None, fallback=False, session=None,
+             on_wait=None):
+        return Span(self.sink, page, endpoint, model=model, contents=contents, tier=tier, fallback=fallback,
+                    scheduler=self.scheduler, session=session if session is not None else current_session(),
+                    on_wait=on_wait)
+
+
+@st.cache_resource
+def get_telemetry():
+    """
+    Process-wide telemetry. Resolve it on the script thread and pass it to
+    worker threads, which have no Streamlit context.
+    """
+    return Telemetry(scheduler=get_scheduler())
+
+
+def summarize_spans(records, by=("page", "endpoint")):
+    """
+    Aggregates span records into one row per `by` group: call count,
+    error, cache-hit and fallback rates, p50/p95/p99 wall time and time to first token
+    for upstream calls, mean tokens (prompt, of which served from the context
+    cache, and response), image bytes and retries, plus p50/p95/p99 time queued
+    for a scheduler slot and the mean queue depth found on arrival.
+    """
+    frame = pd.DataFrame.from_records(records, columns=SPAN_FIELDS)
+    if frame.empty:
+        return pd.DataFrame()
+    frame = frame.assign(
+        errored=frame['error'].notna(),
+        fell_back=frame['fallback'].eq(True),
+        hit=frame['cache'].eq("hit"),
+        # Cache hits never reach upstream; they would flatten the latency percentiles.
+        upstream_wall_ms=frame['wall_ms'].where(frame['cache'].ne("hit")),
+        upstream_ttft_ms=frame['ttft_ms'].where(frame['cache'].ne("hit")),
+        # Absent for spans recorded without a scheduler.
+        queue_ms=pd.to_numeric(frame['queue_ms']),
+        queue_depth=pd.to_numeric(frame['queue_depth']),
+    )
+    grouped = frame.groupby(list(by), dropna=False)
+    table = grouped.agg(
+        calls=('endpoint', 'size'), error_rate=('errored', 'mean'), cache_hit_rate=('hit', 'mean'),
+        fallback_rate=('fell_back', 'mean'),
+        retries=('retries', 'mean'), prompt_tokens=('prompt_tokens', 'mean'), cached_tokens=('cached_tokens', 'mean'),
+        response_tokens=('response_tokens', 'mean'), image_kb=('image_bytes', 'mean'),
+        queue_depth=('queue_depth', 'mean'),
+    )
+    table['image_kb'] /= 1024
+    for column, label in (('upstream_wall_ms', 'wall'), ('upstream_ttft_ms', 'ttft'), ('queue_ms', 'queue')):
+        quantiles = grouped[column].quantile(list(PERCENTILES)).unstack()
+        for q in PERCENTILES:
+            table[f"{label}_p{round(q * 100)}_ms"] = quantiles[q]
+    return table.reset_index()
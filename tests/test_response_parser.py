@@ -0,0 +1,109 @@
+import pytest
+
+from response_parser import SectionParser, iter_sections, parse_response
+
+RESPONSE = (
+    "Here is your plan.\n"
+    "[START_FEEDING_PLAN]\n### Feeding Plan\n- Feed every 2-3 hours.\n[END_FEEDING_PLAN]\n"
+    "[START_RESOURCES]\n- See [WHO guidance](https://www.who.int).\n[END_RESOURCES]\n"
+    "Take care!"
+)
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def streamed(text, size):
+    """Feeds `text` in chunks of `size`; returns the events and the parser's result."""
+    parser = SectionParser()
+    events = list(iter_sections(chunked(text, size), parser))
+    return events, parser.result
+
+
+def joined(events):
+    """Concatenates the events' text per section, in order of first appearance."""
+    out = {}
+    for section, text in events:
+        out[section] = out.get(section, "") + text
+    return out
+
+
+def test_parse_response_splits_sections():
+    result = parse_response(RESPONSE)
+    assert result.preamble == "Here is your plan.\n"
+    assert result.get("FEEDING_PLAN") == "\n### Feeding Plan\n- Feed every 2-3 hours.\n"
+    assert result.get("RESOURCES") == "\n- See [WHO guidance](https://www.who.int).\n"
+    assert result.trailing == "\n\nTake care!"
+    assert result.closed == {"FEEDING_PLAN", "RESOURCES"}
+    assert result.is_complete(["FEEDING_PLAN", "RESOURCES"])
+    assert result.text == RESPONSE
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_any_chunk_size_matches_one_pass_parse(size):
+    expected = parse_response(RESPONSE)
+    events, result = streamed(RESPONSE, size)
+    assert result.preamble == expected.preamble
+    assert result.sections == expected.sections
+    assert result.trailing == expected.trailing
+    assert result.closed == expected.closed
+    assert result.text == RESPONSE
+    # No delimiter leaks into the emitted text, even when split across chunks.
+    assert not any("[START_" in text or "[END_" in text for _, text in events)
+    assert joined(events)["FEEDING_PLAN"] == expected.get("FEEDING_PLAN")
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_missing_end_keeps_text_and_reports_incomplete(size):
+    text = "[START_FEEDING_PLAN]\nFeed on demand.\n[START_RESOURCES]\nLinks, but no end marker"
+    _, result = streamed(text, size)
+    assert result.get("FEEDING_PLAN") == "\nFeed on demand.\n"
+    assert result.get("RESOURCES") == "\nLinks, but no end marker"
+    assert result.closed == set()
+    assert not result.is_complete(["FEEDING_PLAN"])
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_partial_delimiter_at_end_of_stream_is_flushed_as_text(size):
+    _, result = streamed("[START_PLAN]Rest well.[END_PL", size)
+    assert result.get("PLAN") == "Rest well.[END_PL"
+    assert "PLAN" not in result.closed
+
+
+@pytest.mark.parametrize("lookalike", [
+    "[start_FEEDING_PLAN]", "[Start_FEEDING_PLAN]", "[START_feeding_plan]", "[END_Plan]",
+    "[STAR_PLAN]", "[START PLAN]", "[START_PLAN", "[[END_]",
+])
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 11])
+def test_lookalike_delimiters_stay_in_the_text(lookalike, size):
+    text = f"Before {lookalike} after."
+    events, result = streamed(text, size)
+    assert result.sections == {}
+    assert result.preamble == text
+    assert joined(events) == {None: text}
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_nested_start_switches_section(size):
+    # A START inside an open section begins the new section; the outer one
+    # is left unclosed and text after the inner END is outside any section.
+    text = "[START_OUTER]a[START_INNER]b[END_INNER]c[END_OUTER]d"
+    events, result = streamed(text, size)
+    assert result.sections == {"OUTER": "a", "INNER": "b"}
+    assert result.trailing == "cd"
+    assert result.closed == {"INNER", "OUTER"}
+    assert joined(events) == {"OUTER": "a", "INNER": "b", None: "cd"}
+
+
+def test_repeated_section_accumulates():
+    result = parse_response("[START_TIPS]one [END_TIPS]between [START_TIPS]two[END_TIPS]")
+    assert result.get("TIPS") == "one two"
+    assert result.trailing == "between "
+
+
+def test_empty_stream():
+    events, result = streamed("", 3)
+    assert events == []
+    assert result.text == result.preamble == ""
+    assert result.sections == {}
@@ -0,0 +1,136 @@
+import pandas as pd
+
+from sepsis_batch import ID_COLUMN, parse_answers, rank_patients, validate_records
+
+# A well patient: every field present and inside the screening thresholds.
+NORMAL_ROW = {
+    'age': 5, 'birth_weight': 3.2, 'current_weight': 3.1, 'gestational_age': 39, 'temperature': 37.0,
+    'heart_rate': 140, 'resp_rate': 45, 'cap_refill': 2, 'urine_output': 2.0, 'spo2': 98, 'bp_systolic': 70,
+    'bp_diastolic': 40, 'ph': 7.35, 'lactate': 1.0, 'crp': 2, 'wbc': 12, 'platelets': 250, 'procalcitonin': 0.2,
+    'glucose': 80, 'feeding_status': "Exclusive Breastfeeding", 'skin_perfusion': "Normal",
+    'blood_culture': "Not Available", 'lethargy': "no",
+}
+
+
+def frame(*rows):
+    return pd.DataFrame([{**NORMAL_ROW, **row} for row in rows])
+
+
+def test_lethargic_row_is_flagged_and_ranked_first():
+    records, problems = validate_records(frame({ID_COLUMN: "calm"}, {ID_COLUMN: "lethargic", 'lethargy': "yes"}))
+    assert problems.empty
+    table = rank_patients(records)
+    assert table[ID_COLUMN].tolist() == ["lethargic", "calm"]
+    assert table['flags'].tolist() == [1, 0]
+
+
+def problems_by_id(problems):
+    return {pid: set(group['problem']) for pid, group in problems.groupby(ID_COLUMN)}
+
+
+def test_valid_rows_are_normalised():
+    records, problems = validate_records(frame({ID_COLUMN: " A1 ", 'lethargy': "Yes"}, {ID_COLUMN: "A2", 'lethargy': "0"}))
+    assert problems.empty
+    assert records[ID_COLUMN].tolist() == ["A1", "A2"]
+    assert records['lethargy'].tolist() == [True, False]
+    assert records['temperature'].dtype.kind == "f"
+
+
+def test_ids_are_generated_without_an_id_column():
+    records, _ = validate_records(frame({}, {}))
+    assert records[ID_COLUMN].tolist() == ["P1", "P2"]
+
+
+def test_duplicate_ids_drop_every_copy():
+    records, problems = validate_records(frame({ID_COLUMN: "A"}, {ID_COLUMN: "A"}, {ID_COLUMN: "B"}))
+    assert records[ID_COLUMN].tolist() == ["B"]
+    assert problems_by_id(problems) == {"A": {"duplicate patient id"}}
+
+
+def test_out_of_range_and_non_numeric_values():
+    records, problems = validate_records(frame(
+        {ID_COLUMN: "hot", 'temperature': 45},
+        {ID_COLUMN: "text", 'heart_rate': "fast"},
+        {ID_COLUMN: "blank", 'spo2': None},
+        {ID_COLUMN: "ok"},
+    ))
+    assert records[ID_COLUMN].tolist() == ["ok"]
+    assert problems_by_id(problems) == {
+        "hot": {"outside 34.0-42.0"},
+        "text": {"missing or not a number"},
+        "blank": {"missing or not a number"},
+    }
+
+
+def test_blank_optional_value_is_allowed_but_garbage_is_not():
+    records, problems = validate_records(frame({ID_COLUMN: "blank", 'procalcitonin': None},
+                                               {ID_COLUMN: "bad", 'procalcitonin': "high"}))
+    assert records[ID_COLUMN].tolist() == ["blank"]
+    assert pd.isna(records['procalcitonin'][0])
+    assert problems_by_id(problems) == {"bad": {"missing or not a number"}}
+
+
+def test_missing_required_column_rejects_every_row():
+    records, problems = validate_records(frame({}, {}).drop(columns=['crp']))
+    assert records.empty
+    assert set(problems['field']) == {'crp'}
+    assert set(problems['problem']) == {"missing column"}
+    assert len(problems) == 2
+
+
+def test_missing_optional_column_is_filled_with_nan():
+    records, problems = validate_records(frame({}, {}).drop(columns=['procalcitonin', 'bp_systolic']))
+    assert problems.empty
+    assert len(records) == 2
+    assert records['procalcitonin'].isna().all() and records['bp_systolic'].isna().all()
+
+
+def test_category_and_yes_no_validation():
+    records, problems = validate_records(frame(
+        {ID_COLUMN: "blue", 'skin_perfusion': "Blue"},
+        {ID_COLUMN: "case", 'blood_culture': "no growth"},
+        {ID_COLUMN: "maybe", 'lethargy': "maybe"},
+        {ID_COLUMN: "ok", 'skin_perfusion': " Mottled ", 'lethargy': "TRUE"},
+    ))
+    assert records[ID_COLUMN].tolist() == ["ok"]
+    assert records['skin_perfusion'][0] == "Mottled"
+    found = problems_by_id(problems)
+    assert found["blue"] == {"expected one of Normal, Pale, Mottled, Cyanotic"}
+    assert found["case"] == {"expected one of Not Available, Pending, No Growth, Growth Detected"}
+    assert found["maybe"] == {"expected yes/no"}
+
+
+def test_parse_answers_skips_malformed_lines():
+    text = "\n".join([
+        "Here are the results:",
+        "[PATIENT A1] High Risk | Fever and mottled skin.",
+        "[PATIENT  B2 ]Moderate Risk|  Raised CRP.  ",
+        "[PATIENT C3] Severe Risk | Unknown tier.",
+        "[PATIENT D4] high risk | Lowercase tier.",
+        "PATIENT E5 Low Risk | No brackets.",
+        "  [PATIENT F6] Low Risk | Indented.",
+        "[PATIENT G7] Low Risk",
+        "[PATIENT H8] Low Risk | ",
+    ])
+    assert parse_answers(text) == {
+        "A1": ("High Risk", "Fever and mottled skin."),
+        "B2": ("Moderate Risk", "Raised CRP."),
+        "H8": ("Low Risk", ""),
+    }
+
+
+def test_rank_with_partial_answers():
+    records, _ = validate_records(frame(
+        {ID_COLUMN: "culture", 'blood_culture': "Growth Detected"},
+        {ID_COLUMN: "febrile", 'temperature': 38.5},
+        {ID_COLUMN: "well"},
+        {ID_COLUMN: "answered_low"},
+        {ID_COLUMN: "answered_high"},
+    ))
+    answers = {"answered_low": ("Low Risk", "Normal findings."), "answered_high": ("High Risk", "Model concern.")}
+    table = rank_patients(records, answers)
+    # Model answers first by tier, then the pending rows by their pre-screen.
+    assert table[ID_COLUMN].tolist() == ["answered_high", "answered_low", "culture", "febrile", "well"]
+    assert table['ai_risk'].tolist() == ["High Risk", "Low Risk", "Pending", "Pending", "Pending"]
+    assert table['rationale'].tolist() == ["Model concern.", "Normal findings.", "", "", ""]
+    assert rank_patients(records, answers, pending="No answer")['ai_risk'].tolist()[2:] == ["No answer"] * 3
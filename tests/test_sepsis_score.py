@@ -0,0 +1,132 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sepsis_score import (FLAG_LABELS, FLAGS, LOW_RISK, SUBSCORES, score_columns, score_csv, score_frame,
+                          score_patient)
+
+
+def raised(result, row=0):
+    return {name for name in FLAG_LABELS if result[f"flag_{name}"][row]}
+
+
+# flag -> (value that raises it, nearest value that does not)
+THRESHOLDS = {
+    "fever": (38.0, 37.9),
+    "hypothermia": (35.9, 36.0),
+    "tachycardia": (181, 180),
+    "bradycardia": (99, 100),
+    "tachypnea": (61, 60),
+    "slow_cap_refill": (3.5, 3),
+    "hypoxemia": (91, 92),
+    "oliguria": (0.9, 1.0),
+    "hyperlactatemia": (2.1, 2.0),
+    "acidosis": (7.24, 7.25),
+    "raised_crp": (10, 9.9),
+    "raised_pct": (2.0, 1.9),
+    "leukopenia": (4.9, 5),
+    "leukocytosis": (30.1, 30),
+    "thrombocytopenia": (149, 150),
+    "hypoglycemia": (44, 45),
+    "hyperglycemia": (181, 180),
+}
+
+
+def test_every_threshold_flag_is_covered():
+    assert set(THRESHOLDS) == set(FLAGS)
+
+
+@pytest.mark.parametrize("name", sorted(THRESHOLDS))
+def test_flag_threshold(name):
+    column = FLAGS[name][1]
+    flagged, normal = THRESHOLDS[name]
+    result = score_columns({column: np.array([flagged, normal])})
+    assert raised(result, 0) == {name}
+    assert raised(result, 1) == set()
+
+
+@pytest.mark.parametrize("value, expected", [
+    (True, True), (False, False), ("yes", True), ("Yes ", True), ("no", False), ("1", True), (1, True),
+    ("", False), (None, False),
+])
+def test_lethargy_flag(value, expected):
+    assert bool(score_columns({'lethargy': np.array([value], dtype=object)})['flag_lethargy'][0]) is expected
+
+
+def test_missing_fields_count_as_normal():
+    result = score_columns({})
+    assert raised(result) == set()
+    assert all(result[f"score_{name}"][0] == 0 for name in SUBSCORES)
+    assert result["score_total"][0] == 0
+    assert result["risk"][0] == LOW_RISK
+
+
+def test_unparsable_and_nan_values_count_as_normal():
+    result = score_columns({'temperature': np.array(["warm", None, np.nan, "38.5"], dtype=object)})
+    assert result["flag_fever"].tolist() == [False, False, False, True]
+
+
+def test_optional_fields_can_be_absent():
+    # Blood pressure and procalcitonin are optional on the page and in batches.
+    with_optional = score_patient({'temperature': 37.0, 'bp_systolic': 60}, {'procalcitonin': 0.5})
+    without = score_patient({'temperature': 37.0}, {})
+    assert with_optional == without
+
+
+@pytest.mark.parametrize("fields, risk", [
+    ({'platelets': 100}, LOW_RISK),                                   # total 1
+    ({'platelets': 99}, "Moderate Risk"),                             # total 2
+    ({'platelets': 99, 'spo2': 89}, "Moderate Risk"),                 # total 4
+    ({'platelets': 99, 'spo2': 84}, "High Risk"),                     # total 5
+    ({'temperature': 39, 'heart_rate': 190}, LOW_RISK),              # 2 flags, no sub-score
+    ({'temperature': 39, 'heart_rate': 190, 'crp': 20}, "Moderate Risk"),
+    ({'temperature': 39, 'heart_rate': 190, 'crp': 20, 'resp_rate': 70, 'procalcitonin': 5}, "Moderate Risk"),
+    ({'temperature': 39, 'heart_rate': 190, 'crp': 20, 'resp_rate': 70, 'procalcitonin': 5, 'wbc': 35}, "High Risk"),
+    ({'blood_culture': "Growth Detected"}, "High Risk"),
+])
+def test_risk_tier_boundaries(fields, risk):
+    assert score_columns(fields)["risk"][0] == risk
+
+
+def test_subscores_are_capped_at_three():
+    result = score_columns({'cap_refill': 5, 'skin_perfusion': "Mottled", 'lactate': 6, 'ph': 7.0, 'glucose': 30})
+    assert result["score_cardiovascular"][0] == 3
+    assert result["score_metabolic"][0] == 3
+
+
+PATIENTS = [
+    ({'temperature': 37.0, 'heart_rate': 140, 'lethargy': False}, {'crp': 3, 'platelets': 250}),
+    ({'temperature': 38.4, 'heart_rate': 190, 'lethargy': True, 'skin_perfusion': "Mottled"}, {'crp': 40, 'ph': 7.1}),
+    ({'temperature': 35.5, 'spo2': 86, 'urine_output': 0.4}, {'platelets': 40, 'blood_culture': "Growth Detected"}),
+    ({'cap_refill': 4}, {'glucose': 200, 'lactate': 3.0}),
+]
+
+
+def test_score_patient_agrees_with_vectorised_scoring():
+    merged = [{**clinical, **lab} for clinical, lab in PATIENTS]
+    fields = sorted({name for patient in merged for name in patient})
+    columns = {name: np.array([patient.get(name, np.nan) for patient in merged], dtype=object) for name in fields}
+    result = score_columns(columns)
+    for row, (clinical, lab) in enumerate(PATIENTS):
+        single = score_patient(clinical, lab)
+        assert single["total"] == result["score_total"][row]
+        assert single["risk"] == result["risk"][row]
+        assert single["subscores"] == {name: result[f"score_{name}"][row] for name in SUBSCORES}
+        assert set(single["flags"]) == {FLAG_LABELS[name] for name in raised(result, row)}
+
+
+def test_score_frame_and_csv_match_columns():
+    csv = "temperature,heart_rate,lethargy\n38.5,190,yes\n37.0,140,no\n"
+    frame = pd.read_csv(io.StringIO(csv))
+    scored = score_frame(frame)
+    assert scored["flag_lethargy"].tolist() == [True, False]
+    assert scored["risk"].tolist() == ["Moderate Risk", LOW_RISK]
+    audited = score_csv(io.StringIO(csv))
+    assert list(audited.columns[:3]) == ["temperature", "heart_rate", "lethargy"]
+    assert audited["score_total"].tolist() == scored["score_total"].tolist()
+
+
+def test_score_frame_handles_an_empty_frame():
+    assert score_frame(pd.DataFrame({'temperature': []})).empty
@@ -0,0 +1,111 @@
+import contextlib
+import hashlib
+import logging
+import os
+import re
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# --- THEME CONFIGURATION ---
+# Styles live as plain CSS files in styles/. Each page loads one bundle: its
+# own sheet plus the shared navigation (and footer) sheets, in the order the
+# pages used to inject them, so later rules still win.
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STYLES_DIR = os.path.join(ROOT, "styles")
+# Served by Streamlit at app/static/ under server.baseUrlPath when
+# server.enableStaticServing is on.
+STATIC_DIR = os.path.join(ROOT, "static")
+STATIC_URL = "app/static"
+
+BUNDLES = {
+    "home": ("home.css", "navigation.css", "footer.css"),
+    "feed": ("feed.css", "navigation.css"),
+    "infection": ("infection.css", "navigation.css"),
+    "nutrition": ("nutrition.css", "navigation.css"),
+    "umbilical": ("umbilical.css", "navigation.css"),
+    "admin": ("navigation.css",),
+}
+
+
+def static_url(filename):
+    """Absolute URL of a file in static/, under the configured server.baseUrlPath."""
+    base = (st.get_option("server.baseUrlPath") or "").strip("/")
+    return "/" + "/".join(part for part in (base, STATIC_URL, filename) if part)
+
+
+def minify_css(css):
+    """Drops comments and insignificant whitespace."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+class Stylesheet:
+    """
+    A minified bundle and the content-hashed URL it is served under.
+    `published` is True once the file is in static/.
+    """
+
+    def __init__(self, bundle, css):
+        self.bundle = bundle
+        self.css = css
+        self.digest = hashlib.sha256(css.encode("utf-8")).hexdigest()[:12]
+        self.filename = f"{bundle}.{self.digest}.min.css"
+        self.href = static_url(self.filename)
+        self.published = False
+
+    def publish(self):
+        """
+        Writes the bundle to static/ and removes older builds of it. On a
+        read-only or full disk the bundle stays unpublished and pages inline it.
+        """
+        path = os.path.join(STATIC_DIR, self.filename)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            if not os.path.exists(path):
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(self.css)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not publish %s; inlining it instead: %s", self.filename, e)
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            return
+        self.published = True
+        try:
+            for name in os.listdir(STATIC_DIR):
+                if name.startswith(f"{self.bundle}.") and name.endswith(".min.css") and name != self.filename:
+                    os.remove(os.path.join(STATIC_DIR, name))
+        except OSError as e:
+            logger.warning("Could not remove older builds of %s: %s", self.bundle, e)
+
+
+@st.cache_resource
+def get_stylesheet(bundle):
+    """Combines and minifies a bundle once per process."""
+    parts = []
+    for filename in BUNDLES[bundle]:
+        with open(os.path.join(STYLES_DIR, filename), encoding="utf-8") as f:
+            parts.append(f.read())
+    sheet = Stylesheet(bundle, minify_css("\n".join(parts)))
+    if st.get_option("server.enableStaticServing"):
+        sheet.publish()
+    return sheet
+
+
+def apply_theme(bundle):
+    """
+    Loads a page's stylesheet. With static serving enabled each rerun only
+    sends a short `@import` of the hashed file, which the browser fetches
+    once and reuses; otherwise, or if the file could not be written, the
+    minified CSS is inlined.
+    """
+    sheet = get_stylesheet(bundle)
+    if sheet.published:
+        st.markdown(f'<style>@import url("{sheet.href}");</style>', unsafe_allow_html=True)
+    else:
+        st.markdown(f"<style>{sheet.css}</style>", unsafe_allow_html=True)
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+# --- CACHE CONFIGURATION ---
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+TRANSLATION_DB_PATH = os.path.join(CACHE_DIR, "translations.sqlite3")
+MEMORY_MAX_ENTRIES = 256
+DISK_MAX_BYTES = 50 * 1024 * 1024
+DISK_TTL_SECONDS = 30 * 24 * 60 * 60
+
+
+def translation_key(text, target_language, model_name):
+    """
+    Returns a stable content hash for a (text, language, model) triple.
+    """
+    digest = hashlib.sha256()
+    for part in (model_name, target_language, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class TranslationCache:
+    """
+    Two-tier translation cache: an in-process LRU in front of a SQLite file.
+    Disk entries expire after `ttl_seconds` and the oldest-accessed rows are
+    evicted once the stored text exceeds `max_bytes`.
+    """
+
+    def __init__(self, db_path=TRANSLATION_DB_PATH, max_entries=MEMORY_MAX_ENTRIES,
+                 max_bytes=DISK_MAX_BYTES, ttl_seconds=DISK_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed)")
+            self._db.commit()
+        except sqlite3.Error:
+            # A read-only or full disk should only cost us the persistent tier.
+            self._db = None
+
+    def get(self, text, target_language, model_name):
+        key = translation_key(text, target_language, model_name)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            value = self._disk_get(key)
+            if value is not None:
+                self._memory_put(key, value)
+            return value
+
+    def set(self, text, target_language, model_name, value):
+        key = translation_key(text, target_language, model_name)
+        with self._lock:
+            self._memory_put(key, value)
+            self._disk_put(key, value)
+
+    def _memory_put(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        now = time.time()
+        try:
+            row = self._db.execute(
+                "SELECT value, created FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM translations WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE translations SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return row[0]
+        except sqlite3.Error:
+            return None
+
+    def _disk_put(self, key, value):
+        if self._db is None:
+            return
+        now = time.time()
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations (key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM translations WHERE created < ?", (now - self.ttl_seconds,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM translations ORDER BY accessed ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM translations WHERE key = ?", (key,))
+            total -= size
+
+
+@st.cache_resource
+def get_translation_cache():
+    """
+    Returns the process-wide translation cache shared by every session.
+    """
+    return TranslationCache()
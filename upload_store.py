@@ -0,0 +1,211 @@
+import atexit
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+from image_preprocess import encode_image
+
+logger = logging.getLogger(__name__)
+
+# --- UPLOAD STORE CONFIGURATION ---
+CHUNK_BYTES = 1024 * 1024
+# Originals live in a temp directory, one file per distinct content. The
+# least recently used go once their total passes DISK_MAX_BYTES, and any
+# left untouched for DISK_TTL_SECONDS.
+DISK_MAX_BYTES = 512 * 1024 * 1024
+DISK_TTL_SECONDS = 2 * 60 * 60
+# Display thumbnails are shared by every session and kept under MEMORY_MAX_BYTES.
+THUMBNAIL_EDGE = 320
+THUMBNAIL_QUALITY = 75
+MEMORY_MAX_BYTES = 16 * 1024 * 1024
+SWEEP_INTERVAL_SECONDS = 60
+# Uploader file ids already spilled, so reruns don't re-hash the same file.
+FILE_ID_MAX_ENTRIES = 1024
+
+
+class UploadExpiredError(FileNotFoundError):
+    """Raised when an upload's original has been swept from disk."""
+
+
+class StoredUpload:
+    """
+    What a session keeps for an upload: its content hash, file name and size.
+    The bytes stay in the UploadStore's temp directory.
+    """
+
+    __slots__ = ("store", "digest", "name", "size")
+
+    def __init__(self, store, digest, name, size):
+        self.store = store
+        self.digest = digest
+        self.name = name
+        self.size = size
+
+    def open(self):
+        """Returns a buffered binary stream over the original on disk."""
+        return self.store.open(self.digest)
+
+    def thumbnail(self):
+        return self.store.thumbnail(self.digest)
+
+    def __repr__(self):
+        return f"StoredUpload({self.name!r}, {self.digest[:12]}, {self.size} bytes)"
+
+
+class UploadStore:
+    """
+    Process-wide, content-addressed store for image uploads. Originals are
+    streamed to a temp directory while they are hashed; sessions keep only
+    a StoredUpload handle. Thumbnails for display are made on first use and
+    held in an LRU shared by every session. Disk and memory caps are
+    enforced on every write and by a periodic sweep.
+    """
+
+    def __init__(self, directory, disk_max_bytes=DISK_MAX_BYTES, ttl_seconds=DISK_TTL_SECONDS,
+                 memory_max_bytes=MEMORY_MAX_BYTES, sweep_interval=SWEEP_INTERVAL_SECONDS):
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.memory_max_bytes = memory_max_bytes
+        self.sweep_interval = sweep_interval
+        self.disk_bytes = 0
+        self.memory_bytes = 0
+        self.evicted = 0
+        self._files = OrderedDict()  # digest -> (size, last access), least recently used first
+        self._thumbnails = OrderedDict()
+        self._file_ids = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest)
+
+    def _touch(self, digest):
+        if digest in self._files:
+            self._files[digest] = (self._files[digest][0], time.monotonic())
+            self._files.move_to_end(digest)
+
+    def put(self, uploaded_file):
+        """Spills an `st.file_uploader` file to disk, once per distinct content, and returns its handle."""
+        file_id = getattr(uploaded_file, "file_id", None)
+        with self._lock:
+            digest = self._file_ids.get(file_id)
+            if digest in self._files:
+                self._touch(digest)
+                return StoredUpload(self, digest, uploaded_file.name, self._files[digest][0])
+
+        hasher = hashlib.sha256()
+        size = 0
+        fd, partial = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                uploaded_file.seek(0)
+                for chunk in iter(lambda: uploaded_file.read(CHUNK_BYTES), b""):
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            uploaded_file.seek(0)
+            digest = hasher.hexdigest()
+            with self._lock:
+                if digest in self._files:
+                    os.remove(partial)
+                else:
+                    os.replace(partial, self._path(digest))
+                    self._files[digest] = (size, time.monotonic())
+                    self.disk_bytes += size
+                self._touch(digest)
+                if file_id is not None:
+                    self._file_ids[file_id] = digest
+                    while len(self._file_ids) > FILE_ID_MAX_ENTRIES:
+                        self._file_ids.popitem(last=False)
+                self._enforce_disk_cap(keep=digest)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        self.sweep()
+        return StoredUpload(self, digest, uploaded_file.name, size)
+
+    def open(self, digest):
+        with self._lock:
+            self._touch(digest)
+        # A stream rather than a memory map: PIL's format probes seek past
+        # the end of short files, which a map rejects.
+        try:
+            return open(self._path(digest), "rb")
+        except FileNotFoundError:
+            raise UploadExpiredError(f"Upload {digest[:12]} is no longer stored; upload it again.") from None
+
+    def thumbnail(self, digest):
+        """JPEG thumbnail bytes for display, or None if the original is gone or not an image."""
+        with self._lock:
+            data = self._thumbnails.get(digest)
+            if data is not None:
+                self._thumbnails.move_to_end(digest)
+                return data
+        try:
+            with self.open(digest) as source:
+                data, _ = encode_image(source, THUMBNAIL_EDGE, "JPEG", THUMBNAIL_QUALITY)
+        except OSError:
+            return None
+        with self._lock:
+            if digest not in self._thumbnails:
+                self._thumbnails[digest] = data
+                self.memory_bytes += len(data)
+            while self.memory_bytes > self.memory_max_bytes and len(self._thumbnails) > 1:
+                _, dropped = self._thumbnails.popitem(last=False)
+                self.memory_bytes -= len(dropped)
+        return data
+
+    def _remove(self, digest):
+        size, _ = self._files.pop(digest)
+        self.disk_bytes -= size
+        self.evicted += 1
+        try:
+            os.remove(self._path(digest))
+        except OSError as e:
+            logger.warning("Could not remove stored upload %s: %s", digest[:12], e)
+
+    def _enforce_disk_cap(self, keep=None):
+        for digest in list(self._files):
+            if self.disk_bytes <= self.disk_max_bytes:
+                break
+            if digest != keep:
+                self._remove(digest)
+
+    def sweep(self, force=False):
+        """Drops originals idle past the TTL, at most once per `sweep_interval` unless forced."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+            for digest, (_, accessed) in list(self._files.items()):
+                if now - accessed > self.ttl_seconds:
+                    self._remove(digest)
+            self._enforce_disk_cap()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "disk_bytes": self.disk_bytes,
+                "thumbnails": len(self._thumbnails),
+                "memory_bytes": self.memory_bytes,
+                "evicted": self.evicted,
+            }
+
+
+@st.cache_resource
+def get_upload_store():
+    """Process-wide upload store in a fresh temp directory, removed at exit."""
+    directory = tempfile.mkdtemp(prefix="incubate-uploads-")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return UploadStore(directory)